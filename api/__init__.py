@@ -3,6 +3,15 @@ from flask_restx import Api
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from .utils import db
+from .utils.user_cache import user_cache, lookup_user
+from .utils.auth_func import ClaimsUser, has_user_claims
+from .utils.password_func import hashing_pool
+from .utils.sequence_func import code_allocator
+from .utils.calc_func import grade_table
+from .utils.job_func import job_runner
+from .utils.request_loader import drop_loader
+from .utils.replica import read_from_primary, replica_router
+from .utils.db_pool import apply_sqlite_pragmas
 from .config.config import config_dict
 from .models import (
     User,
@@ -13,6 +22,9 @@ from .models import (
     Department,
     GradeScale,
     StudentRecord,
+    TokenBlocklist,
+    CodeSequence,
+    GradeUploadJob,
 )
 from .auth.views import auth_namespace
 from .student.views import student_namespace
@@ -24,6 +36,7 @@ from .blocklist import BLOCKLIST
 from werkzeug.exceptions import NotFound, MethodNotAllowed, Unauthorized
 from flask_jwt_extended.exceptions import NoAuthorizationError
 from .create_defaults import create_defaults
+from .commands import records_cli, enroll
 
 
 def create_app(config=config_dict["dev"]):
@@ -32,15 +45,47 @@ def create_app(config=config_dict["dev"]):
     app.config.from_object(config)
 
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine, app.config["SQLITE_PRAGMAS"])
 
     migrate = Migrate(app, db)
 
     jwt = JWTManager(app)
 
+    user_cache.configure(
+        maxsize=app.config["USER_CACHE_MAXSIZE"], ttl=app.config["USER_CACHE_TTL"]
+    )
+    hashing_pool.configure(
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        queue_size=app.config["PASSWORD_HASH_QUEUE_SIZE"],
+        timeout=app.config["PASSWORD_HASH_TIMEOUT"],
+        retry_after=app.config["PASSWORD_HASH_RETRY_AFTER"],
+    )
+    code_allocator.configure(block_size=app.config["CODE_BLOCK_SIZE"])
+    grade_table.configure(ttl=app.config["GRADE_TABLE_TTL"])
+    job_runner.configure(workers=app.config["JOB_WORKERS"])
+    replica_router.configure(
+        max_lag=app.config["REPLICA_MAX_LAG"],
+        lag_check_interval=app.config["REPLICA_LAG_CHECK_INTERVAL"],
+        read_your_writes=app.config["REPLICA_READ_YOUR_WRITES"],
+    )
+    BLOCKLIST.configure(
+        capacity=app.config["BLOCKLIST_CAPACITY"],
+        error_rate=app.config["BLOCKLIST_ERROR_RATE"],
+        sync_interval=app.config["BLOCKLIST_SYNC_INTERVAL"],
+        purge_interval=app.config["BLOCKLIST_PURGE_INTERVAL"],
+    )
+
     @jwt.user_lookup_loader
     def user_lookup_callback(_jwt_header, jwt_data):
         identity = jwt_data["sub"]
-        return User.query.filter_by(username=identity).one_or_none()
+        if app.config["JWT_STATELESS_AUTH"] and has_user_claims(jwt_data):
+            return ClaimsUser(identity, jwt_data)
+        # the token is not verified yet, so a user that just wrote is not known to the replica router;
+        # a stale user must not be cached either
+        with read_from_primary():
+            return lookup_user(identity)
 
     @jwt.token_in_blocklist_loader
     def check_if_token_in_blacklist(jwt_header, jwt_payload):
@@ -72,6 +117,14 @@ def create_app(config=config_dict["dev"]):
     api.add_namespace(teacher_namespace, path="/teachers")
     api.add_namespace(admin_namespace, path="/admin")
 
+    # entities looked up by a request are memoized on flask.g for that request only
+    app.teardown_request(drop_loader)
+    # GET requests read from the replica bind, if any; clients that just wrote are sent to the primary
+    app.after_request(replica_router.mark_writer)
+
+    app.cli.add_command(records_cli)
+    app.cli.add_command(enroll)
+
     # error handlers
     @api.errorhandler(NotFound)
     def not_found(error):
@@ -107,6 +160,9 @@ def create_app(config=config_dict["dev"]):
             "StudentCourse": StudentCourseScore,
             "StudentCourse": StudentRecord,
             "Department": Department,
+            "TokenBlocklist": TokenBlocklist,
+            "CodeSequence": CodeSequence,
+            "GradeUploadJob": GradeUploadJob,
             "create_defaults": create_defaults
         }
 
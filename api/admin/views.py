@@ -1,8 +1,13 @@
 from flask_restx import Resource
-from werkzeug.security import generate_password_hash
 from ..admin import admin_namespace
 from ..models import User
 from ..admin.schemas import admin_model, new_admin_model
+from ..utils import db
+from ..utils.user_cache import user_cache
+from ..utils.db_pool import pool_stats
+from ..utils.auth_func import admin_required
+from ..utils.password_func import hash_password
+from ..utils.sequence_func import code_allocator
 from http import HTTPStatus
 from decouple import config
 
@@ -23,15 +28,31 @@ class AdminRegister(Resource):
             last_name=data["last_name"],
             gender=data["gender"],
             email=data["email"],
-            password_hash=generate_password_hash(config("DEFAULT_ADMIN_PASSWORD")),
+            password_hash=hash_password(config("DEFAULT_ADMIN_PASSWORD")),
+            must_change_password=True,
             department_id = 1,
             is_admin=True,
             is_staff=True,
             created_by="admin"
         )
+        new_user.username = User.make_username(code_allocator.next("username"), new_user.first_name, new_user.last_name)
         new_user.save_to_db()
-        new_user.generate_username(new_user.id, new_user.first_name, new_user.last_name)
         return new_user, HTTPStatus.CREATED
 
 
 
+
+
+@admin_namespace.route("/stats")
+class AdminStats(Resource):
+    @admin_namespace.doc(description="Retrieve Runtime Statistics (Admin Only)")
+    @admin_required()
+    def get(self):
+        """
+        Admin: Get Runtime Statistics
+        """
+        response = {
+            "user_cache": user_cache.stats(),
+            "db_pools": pool_stats(db.engines),
+        }
+        return response, HTTPStatus.OK
@@ -72,3 +72,30 @@ change_password_model = auth_namespace.model(
         ),
     },
 )
+
+
+# BULK REGISTRATION RESULT SCHEMA
+bulk_register_row_model = auth_namespace.model(
+    name="Bulk Registration Row",
+    model={
+        "row": fields.Integer(description="Row Number in the Upload"),
+        "email": fields.String(description="Email"),
+        "status": fields.String(description="Row Status", enum=["created", "failed"]),
+        "message": fields.String(description="Reason the Row Failed"),
+        "user_id": fields.Integer(description="User ID"),
+        "username": fields.String(description="Username"),
+        "student_id": fields.Integer(description="Student ID"),
+        "matric_no": fields.String(description="Student Matric No."),
+        "teacher_id": fields.Integer(description="Teacher ID"),
+        "staff_code": fields.String(description="Teacher's Staff Code"),
+    },
+)
+
+bulk_register_result_model = auth_namespace.model(
+    name="Bulk Registration Result",
+    model={
+        "created": fields.Integer(description="Count of Users Created"),
+        "failed": fields.Integer(description="Count of Rows Failed"),
+        "results": fields.List(fields.Nested(bulk_register_row_model), description="Result per Row"),
+    },
+)
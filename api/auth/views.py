@@ -1,11 +1,16 @@
+from flask import current_app, request
 from flask_restx import Resource, abort
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt, get_jwt_identity, jwt_required, current_user
 from ..auth import auth_namespace
-from ..auth.schemas import login_model, register_model, user_model, change_password_model
+from ..auth.schemas import login_model, register_model, user_model, change_password_model, bulk_register_result_model
 from ..models import User, Student, Teacher, StudentRecord
 from http import HTTPStatus
 from ..blocklist import BLOCKLIST
+from ..utils.auth_func import admin_required, get_user_claims, get_token_claims
+from ..utils.password_func import hash_password, verify_password, password_needs_rehash
+from ..utils.register_func import read_bulk_rows, register_users
+from ..utils.sequence_func import code_allocator
+from ..utils import db
 from decouple import config
 
 
@@ -33,16 +38,17 @@ class UserRegister(Resource):
                         last_name=data["last_name"],
                         gender=data["gender"],
                         email=data["email"],
-                        password_hash=generate_password_hash(config("DEFAULT_STUDENT_PASSWORD")),
+                        password_hash=hash_password(config("DEFAULT_STUDENT_PASSWORD")),
+                        must_change_password=True,
                         department_id=data["department_id"],
                         created_by=current_user.username,
                         is_staff=False,
                     )
-                    new_student.save_to_db()
-                    # generate username
-                    new_student.generate_username(new_student.user_id, new_student.first_name, new_student.last_name)
-                    # generate matric number
-                    new_student.generate_matric_no(new_student.student_id)
+                    # generate username and matric number
+                    new_student.username = User.make_username(code_allocator.next("username"), new_student.first_name, new_student.last_name)
+                    new_student.matric_no = Student.make_matric_no(code_allocator.next("matric_no"))
+                    db.session.add(new_student)
+                    db.session.flush()
 
                     # instantiate new Student Records class
                     new_stu_record = StudentRecord(
@@ -66,16 +72,16 @@ class UserRegister(Resource):
                         last_name=data["last_name"],
                         gender=data["gender"],
                         email=data["email"],
-                        password_hash=generate_password_hash(config("DEFAULT_TEACHER_PASSWORD")),
+                        password_hash=hash_password(config("DEFAULT_TEACHER_PASSWORD")),
+                        must_change_password=True,
                         department_id=data["department_id"],
                         created_by=current_user.username,
                         is_staff=True,
                     )
+                    # generate username and staff code
+                    new_teacher.username = User.make_username(code_allocator.next("username"), new_teacher.first_name, new_teacher.last_name)
+                    new_teacher.staff_code = Teacher.make_staff_code(code_allocator.next("staff_code"))
                     new_teacher.save_to_db()
-                    # generate username
-                    new_teacher.generate_username(new_teacher.user_id, new_teacher.first_name, new_teacher.last_name)
-                    # generate matric number
-                    new_teacher.generate_staff_code(new_teacher.teacher_id)
 
                     return new_teacher, HTTPStatus.CREATED                
                 abort(HTTPStatus.CONFLICT, message="Email already exist")                
@@ -83,6 +89,31 @@ class UserRegister(Resource):
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only")
 
 
+# BULK USER REGISTRATION
+@auth_namespace.route("/register/bulk")
+class UserBulkRegister(Resource):
+    @auth_namespace.expect([register_model])
+    @auth_namespace.marshal_with(bulk_register_result_model)
+    @auth_namespace.doc(description="Bulk User Registration from a JSON Array or a CSV (text/csv) Body (Admin Only)")
+    @admin_required()
+    def post(self):
+        """
+        Admin: Register Multiple Users
+        """
+        rows = read_bulk_rows(request)
+        if rows is None:
+            abort(HTTPStatus.BAD_REQUEST, message="Send a JSON array or a text/csv body of users")
+
+        result = register_users(
+            rows,
+            created_by=current_user.username,
+            chunk_size=current_app.config["BULK_REGISTER_CHUNK_SIZE"],
+        )
+        if result["created"]:
+            return result, HTTPStatus.CREATED
+        return result, HTTPStatus.BAD_REQUEST
+
+
 # USER LOGIN
 @auth_namespace.route("/login")
 class UserLogin(Resource):
@@ -98,25 +129,27 @@ class UserLogin(Resource):
         password = data["password"]
 
         user = User.query.filter_by(email=email).first()
-        if user and check_password_hash(user.password_hash, password):
-            access_token = create_access_token(identity=user.username)
-            refresh_token = create_refresh_token(identity=user.username)
+        if user and verify_password(user.password_hash, password):
+            # add the authorization claims in stateless mode
+            claims = get_user_claims(user) if current_app.config["JWT_STATELESS_AUTH"] else None
+            access_token = create_access_token(identity=user.username, additional_claims=claims)
+            refresh_token = create_refresh_token(identity=user.username, additional_claims=claims)
+            message = "Login Successful!"
             # check if login password is still default password
-            if check_password_hash(user.password_hash, config("DEFAULT_STUDENT_PASSWORD")) or check_password_hash(user.password_hash, config("DEFAULT_TEACHER_PASSWORD")) or check_password_hash(user.password_hash, config("DEFAULT_ADMIN_PASSWORD")):
-                response = {
-                    "message": "Login Successful! Please Change the Default Password!",
-                    "access_token": access_token,
-                    "refresh_token": refresh_token,
-                }
-                return response, HTTPStatus.CREATED
+            if user.must_change_password:
+                message = "Login Successful! Please Change the Default Password!"
 
-            response = {
-                    "message": "Login Successful!",
-                    "access_token": access_token,
-                    "refresh_token": refresh_token,
-                }
+            # upgrade hashes made with outdated parameters while the password is at hand
+            if password_needs_rehash(user.password_hash):
+                user.password_hash = hash_password(password)
+                user.update_db()
 
-            return response, HTTPStatus.CREATED    
+            response = {
+                "message": message,
+                "access_token": access_token,
+                "refresh_token": refresh_token,
+            }
+            return response, HTTPStatus.CREATED
         abort(HTTPStatus.UNAUTHORIZED, message="Invalid Credentials")
 
 
@@ -130,7 +163,8 @@ class TokenRefresh(Resource):
         Refresh JWT Access Token
         """
         identity = get_jwt_identity()
-        access_token = create_access_token(identity=identity)
+        claims = get_token_claims(get_jwt()) if current_app.config["JWT_STATELESS_AUTH"] else None
+        access_token = create_access_token(identity=identity, additional_claims=claims)
 
         response = {
             "message": "Refresh Successful.",
@@ -151,7 +185,7 @@ class UserLogout(Resource):
         """
         token = get_jwt()
         jti = token["jti"]
-        BLOCKLIST.add(jti)
+        BLOCKLIST.add(jti, token["exp"])
 
         return {"message": "Logged Out Successfully!"}
 
@@ -175,15 +209,16 @@ class UserPasswordChange(Resource):
         confirm_password = data["confirm_password"]
 
         if new_password == confirm_password:
-            if user and check_password_hash(user.password_hash, old_password):
-                user.password_hash = generate_password_hash(new_password)
+            if user and verify_password(user.password_hash, old_password):
+                user.password_hash = hash_password(new_password)
+                user.must_change_password = False
 
                 user.update_db()
 
                 # logs out current user
                 token = get_jwt()
                 jti = token["jti"]
-                BLOCKLIST.add(jti)
+                BLOCKLIST.add(jti, token["exp"])
 
                 response = {"message": "Password Changed Successfully. Please Log-in Again"}
                 return response, HTTPStatus.OK
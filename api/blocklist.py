@@ -1 +1,125 @@
-BLOCKLIST = set()
\ No newline at end of file
+import hashlib
+import math
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+from .models import TokenBlocklist
+from .utils import db
+from .utils.replica import read_from_primary
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings. A negative answer is definite,
+    a positive answer has to be confirmed against the token store.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class Blocklist:
+    """
+    Blocked JWT IDs shared by all workers through the token_blocklist table.
+
+    Each worker keeps a Bloom filter of the blocked JTIs. Tokens the filter has never seen
+    are accepted without touching the database; every `sync_interval` seconds the filter is
+    rebuilt from all the unexpired JTIs in the table, so tokens blocked by other workers are
+    picked up whatever order their rows were committed in. Expired tokens are deleted
+    every `purge_interval` seconds, by the worker blocking a token.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.01, sync_interval=5, purge_interval=3600):
+        self.configure(capacity, error_rate, sync_interval, purge_interval)
+
+    def configure(self, capacity, error_rate, sync_interval, purge_interval) -> None:
+        """function to reset the worker state, called once per app."""
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.purge_interval = purge_interval
+        self._lock = Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        # JTIs blocked by this worker while a rebuild is reading the table, None outside rebuilds
+        self._added_during_sync = None
+        self._synced_at = None
+        self._purged_at = monotonic()
+
+    def add(self, jti, expires) -> None:
+        """
+        function to block a token until it expires.
+
+        :param jti: the JWT ID
+        :param expires: the token expiry ("exp" claim) as a UNIX timestamp
+        :type jti: str
+        :type expires: int
+        """
+        blocked_token = TokenBlocklist(jti=jti, expires_at=datetime.utcfromtimestamp(expires))
+        blocked_token.save_to_db()
+        with self._lock:
+            self._bloom.add(jti)
+            if self._added_during_sync is not None:
+                self._added_during_sync.append(jti)
+        if monotonic() - self._purged_at >= self.purge_interval:
+            self.purge_expired()
+
+    def __contains__(self, jti) -> bool:
+        # a token blocked by another worker must not pass on a lagging replica
+        with read_from_primary():
+            # until a first rebuild is done the filter is empty, so the table is asked
+            if self._sync() and jti not in self._bloom:
+                return False
+            return db.session.query(TokenBlocklist.id).filter_by(jti=jti).first() is not None
+
+    def purge_expired(self) -> int:
+        """function to delete expired tokens from the store. Commits the session."""
+        self._purged_at = monotonic()
+        deleted = TokenBlocklist.query.filter(TokenBlocklist.expires_at < datetime.utcnow()).delete()
+        db.session.commit()
+        return deleted
+
+    def _sync(self) -> bool:
+        # rebuilds the filter when it is due; tells whether the filter has been built at least once
+        now = monotonic()
+        if self._synced_at is not None and now - self._synced_at < self.sync_interval:
+            return True
+        with self._lock:
+            if self._added_during_sync is not None:
+                # another thread is rebuilding the filter, the last one built is used meanwhile
+                return self._synced_at is not None
+            self._added_during_sync = []
+        try:
+            bloom = BloomFilter(self.capacity, self.error_rate)
+            unexpired = db.session.query(TokenBlocklist.jti).filter(TokenBlocklist.expires_at >= datetime.utcnow())
+            for (jti,) in unexpired:
+                bloom.add(jti)
+            with self._lock:
+                for jti in self._added_during_sync:
+                    bloom.add(jti)
+                self._bloom = bloom
+                self._synced_at = now
+        finally:
+            with self._lock:
+                self._added_during_sync = None
+        return True
+
+
+BLOCKLIST = Blocklist()
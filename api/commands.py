@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from time import perf_counter
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from sqlalchemy import func
+from .models import StudentRecord
+from .utils import db
+from .utils.calc_func import check_students_records, rebuild_students_records
+from .utils.db_pool import without_statement_timeout
+from .utils.enroll_func import enroll_students
+from .utils.view_func import rebuild_student_course_view
+
+
+records_cli = AppGroup("records", help="Maintain the students records aggregates and the student course view.")
+
+
+def no_statement_timeout(command):
+    # the full-table statements of the commands may run longer than the statement_timeout of the app
+    @wraps(command)
+    def run_command(*args, **kwargs):
+        with without_statement_timeout(db.engine):
+            return command(*args, **kwargs)
+    return run_command
+
+
+@records_cli.command("check")
+@click.option("--repair", is_flag=True, help="Write the recomputed values to the mismatched records.")
+@click.option("--student-id", "student_ids", type=int, multiple=True, help="Only check these students.")
+@no_statement_timeout
+def check_records(repair, student_ids):
+    """Verify the students records against a full recompute from their courses."""
+    mismatches = check_students_records(list(student_ids) or None, repair=repair)
+    for mismatch in mismatches:
+        fields = ", ".join(
+            f"{field}: {values['stored']} != {values['expected']}"
+            for field, values in mismatch["fields"].items()
+        )
+        click.echo(f"Student {mismatch['student_id']}: {fields}")
+    action = "repaired" if repair else "found"
+    click.echo(f"{len(mismatches)} mismatched records {action}.")
+
+
+@records_cli.command("rebuild")
+@click.option("--chunk-size", type=click.IntRange(min=1), default=5000, show_default=True,
+              help="Student IDs per chunk, each chunk is committed on its own.")
+@click.option("--workers", type=click.IntRange(min=1), default=1, show_default=True,
+              help="Chunks rebuilt in parallel.")
+@click.option("--regrade", is_flag=True, help="Grade the scores again against the grade scale first.")
+@no_statement_timeout
+def rebuild_records(chunk_size, workers, regrade):
+    """Recompute every student record from the student courses scores."""
+    first_id, last_id = db.session.query(
+        func.min(StudentRecord.student_id), func.max(StudentRecord.student_id)
+    ).one()
+    if first_id is None:
+        click.echo("No students records to rebuild.")
+        return
+    chunks = [
+        range(start, min(start + chunk_size, last_id + 1))
+        for start in range(first_id, last_id + 1, chunk_size)
+    ]
+
+    app = current_app._get_current_object()
+
+    def rebuild_chunk(chunk):
+        # each thread gets its own app context, hence its own session and connection
+        with app.app_context():
+            return rebuild_students_records(chunk, regrade=regrade)
+
+    started = perf_counter()
+    if workers == 1:
+        rebuilt = sum(rebuild_students_records(chunk, regrade=regrade) for chunk in chunks)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            rebuilt = sum(executor.map(rebuild_chunk, chunks))
+    elapsed = perf_counter() - started
+    click.echo(
+        f"{rebuilt} students records rebuilt in {len(chunks)} chunks, {elapsed:.2f}s "
+        f"({rebuilt / elapsed:.0f} rows/sec)."
+    )
+
+
+@records_cli.command("rebuild-view")
+@click.option("--chunk-size", type=click.IntRange(min=1), default=5000, show_default=True,
+              help="Student IDs per chunk, each chunk is committed on its own.")
+@no_statement_timeout
+def rebuild_view(chunk_size):
+    """Rebuild the student course view from the registrations, students, courses and teachers."""
+    started = perf_counter()
+    rows = rebuild_student_course_view(chunk_size)
+    click.echo(f"{rows} student course view rows rebuilt in {perf_counter() - started:.2f}s.")
+
+
+@click.command("enroll")
+@click.option("--course-id", "course_ids", type=int, multiple=True, required=True, help="Course to register, repeatable.")
+@click.option("--department-id", type=int, help="Enroll every student of this department.")
+@click.option("--student-id", "student_ids", type=int, multiple=True, help="Or enroll these students, repeatable.")
+@click.option("--registered-by", default="admin", show_default=True, help="Username recorded on the registrations.")
+@with_appcontext
+@no_statement_timeout
+def enroll(course_ids, department_id, student_ids, registered_by):
+    """Register a department or a list of students into courses."""
+    started = perf_counter()
+    try:
+        result = enroll_students(
+            list(course_ids), registered_by, department_id=department_id, student_ids=list(student_ids)
+        )
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    elapsed = perf_counter() - started
+    click.echo(
+        f"{result['registered']} registrations created for {result['students']} students in {elapsed:.2f}s "
+        f"({result['registered'] / elapsed:.0f} rows/sec)."
+    )
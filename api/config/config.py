@@ -2,28 +2,127 @@ import os
 import re
 from datetime import timedelta
 from decouple import config
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS
+
+from sqlalchemy.pool import StaticPool
+from ..utils.db_pool import InstrumentedQueuePool
 
 base_dir = os.path.dirname(os.path.realpath(__file__))
 
 
+def engine_options(uri, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True,
+                   statement_timeout=0) -> dict:
+    """
+    function to build the engine options of a database URI from the given defaults, each overridable
+    from the environment: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE (seconds,
+    -1 never recycles), DB_POOL_PRE_PING, and DB_STATEMENT_TIMEOUT (milliseconds, 0 for none, PostgreSQL only).
+    """
+    if uri in ("sqlite://", "sqlite:///:memory:"):
+        # an in-memory database lives as long as its connection, so all threads share the one connection,
+        # and with it one transaction: a commit from any thread (e.g. a background job) commits the work
+        # the others have pending. tests of concurrent transactions need a database file instead.
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": config("DB_POOL_SIZE", pool_size, cast=int),
+        "max_overflow": config("DB_MAX_OVERFLOW", max_overflow, cast=int),
+        "pool_timeout": config("DB_POOL_TIMEOUT", pool_timeout, cast=float),
+        "pool_recycle": config("DB_POOL_RECYCLE", pool_recycle, cast=int),
+        "pool_pre_ping": config("DB_POOL_PRE_PING", pool_pre_ping, cast=bool),
+    }
+    statement_timeout = config("DB_STATEMENT_TIMEOUT", statement_timeout, cast=int)
+    if statement_timeout and uri.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
 class Config:
     SECRET_KEY = config("SECRET_KEY", "secret")
     JWT_SECRET_KEY = config("JWT_SECRET_KEY")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=120)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(minutes=60)
+    # embed is_admin, type, student_id/teacher_id and department_id in the tokens and authorize from them,
+    # without loading the user. role changes only apply to tokens issued after the change.
+    JWT_STATELESS_AUTH = config("JWT_STATELESS_AUTH", False, cast=bool)
+
+    # hashes made with other parameters are upgraded on the next successful login
+    PASSWORD_HASH_METHOD = config("PASSWORD_HASH_METHOD", f"pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}")
+    # password hashing runs on a process pool of PASSWORD_HASH_WORKERS processes (0 hashes inline).
+    # beyond PASSWORD_HASH_QUEUE_SIZE operations in flight, requests get a 503 with Retry-After.
+    PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", 0, cast=int)
+    PASSWORD_HASH_QUEUE_SIZE = config("PASSWORD_HASH_QUEUE_SIZE", 16, cast=int)
+    PASSWORD_HASH_TIMEOUT = config("PASSWORD_HASH_TIMEOUT", 30, cast=int)  # seconds
+    PASSWORD_HASH_RETRY_AFTER = config("PASSWORD_HASH_RETRY_AFTER", 1, cast=int)  # seconds
+
+    # usernames, matric numbers and staff codes reserved per process at a time
+    CODE_BLOCK_SIZE = config("CODE_BLOCK_SIZE", 20, cast=int)
+    # users committed per transaction by the bulk registration
+    BULK_REGISTER_CHUNK_SIZE = config("BULK_REGISTER_CHUNK_SIZE", 500, cast=int)
+
+    # the compiled grade scale is rebuilt on changes in the same process, and after this many seconds otherwise
+    GRADE_TABLE_TTL = config("GRADE_TABLE_TTL", 60, cast=int)
+    # rows per page of the list routes, when the request has no limit, and the largest limit allowed
+    PAGINATION_DEFAULT_LIMIT = config("PAGINATION_DEFAULT_LIMIT", 50, cast=int)
+    PAGINATION_MAX_LIMIT = config("PAGINATION_MAX_LIMIT", 500, cast=int)
+    # rows fetched at a time by the streaming export routes
+    STREAM_YIELD_PER = config("STREAM_YIELD_PER", 1000, cast=int)
+
+    # largest request body accepted, in bytes; grade uploads are read into memory whole
+    MAX_CONTENT_LENGTH = config("MAX_CONTENT_LENGTH", 8 * 1024 * 1024, cast=int)
+    # grade uploads with more rows than this are graded by a background job
+    GRADE_UPLOAD_BACKGROUND_ROWS = config("GRADE_UPLOAD_BACKGROUND_ROWS", 200, cast=int)
+    # threads running background jobs, per process
+    JOB_WORKERS = config("JOB_WORKERS", 2, cast=int)
+
+    # per-process cache of users resolved from the JWT identity
+    USER_CACHE_MAXSIZE = config("USER_CACHE_MAXSIZE", 1024, cast=int)
+    USER_CACHE_TTL = config("USER_CACHE_TTL", 300, cast=int)  # seconds
+
+    # blocked tokens are shared through the database, each worker keeps a bloom filter in front of it.
+    # tokens blocked by another worker are picked up within BLOCKLIST_SYNC_INTERVAL seconds.
+    BLOCKLIST_CAPACITY = config("BLOCKLIST_CAPACITY", 100000, cast=int)
+    BLOCKLIST_ERROR_RATE = config("BLOCKLIST_ERROR_RATE", 0.01, cast=float)
+    BLOCKLIST_SYNC_INTERVAL = config("BLOCKLIST_SYNC_INTERVAL", 5, cast=int)  # seconds
+    BLOCKLIST_PURGE_INTERVAL = config("BLOCKLIST_PURGE_INTERVAL", 3600, cast=int)  # seconds
+
+    # GET and HEAD requests read from the REPLICA_DATABASE_URL database when it is set, unless it is more than
+    # REPLICA_MAX_LAG seconds behind (measured every REPLICA_LAG_CHECK_INTERVAL seconds).
+    # clients read from the primary for REPLICA_READ_YOUR_WRITES seconds after a write: on every worker when they
+    # send back the read_primary_until cookie, otherwise only on the worker process that served the write, as the
+    # writers are remembered per process (API clients that drop cookies may read stale data on the other workers).
+    replica_uri = config("REPLICA_DATABASE_URL", "")
+    if replica_uri.startswith("postgres://"):
+        replica_uri = replica_uri.replace("postgres://", "postgresql://", 1)
+    SQLALCHEMY_BINDS = {"replica": {"url": replica_uri, **engine_options(replica_uri)}} if replica_uri else {}
+    REPLICA_MAX_LAG = config("REPLICA_MAX_LAG", 5, cast=float)  # seconds
+    REPLICA_LAG_CHECK_INTERVAL = config("REPLICA_LAG_CHECK_INTERVAL", 1, cast=float)  # seconds
+    REPLICA_READ_YOUR_WRITES = config("REPLICA_READ_YOUR_WRITES", 5, cast=int)  # seconds
+
+    # run on every new connection of SQLite databases (development and tests)
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",  # readers and the writer do not block each other
+        "synchronous": "NORMAL",  # durable with WAL, syncs at checkpoints only
+        "cache_size": config("SQLITE_CACHE_SIZE", -65536, cast=int),  # negative: in KiB, 64 MiB
+        "mmap_size": config("SQLITE_MMAP_SIZE", 268435456, cast=int),  # bytes, 256 MiB
+        "foreign_keys": "ON",
+    }
 
     SQLALCHEMY_TRACK_MODIFICATION = False
-    SQLALCHEMY_ECHO = True
+    # logs every statement, set SQLALCHEMY_ECHO=True to debug queries
+    SQLALCHEMY_ECHO = config("SQLALCHEMY_ECHO", False, cast=bool)
 
 
 class DevelopmentConfig(Config):
     SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(base_dir, "db.sqlite3")
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     DEBUG = True  
 
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite://"  # for in-memory database
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_BINDS = {}
     SQLALCHEMY_ECHO = False
 
 
@@ -34,8 +133,12 @@ class ProductionConfig(Config):
         uri = uri.replace("postgres://", "postgresql://", 1)
 
     SQLALCHEMY_DATABASE_URI = uri
+    # per worker process; keep workers * (size + overflow) under the server's connection limit.
+    # the statement timeout is lifted for the migrations and the records and enroll commands
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(uri, pool_size=5, max_overflow=5, pool_timeout=10, pool_recycle=300,
+                                               statement_timeout=30000)
     DEBUG = config("DEBUG", False, cast=bool)
-    SQLALCHEMY_ECHO = False
+    PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", 2, cast=int)
 
     # # uncomment this part for development run
     # pass 
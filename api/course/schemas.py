@@ -68,29 +68,44 @@ course_students_grades_model = course_namespace.model(
 )
 
 
+student_score_model = course_namespace.model(
+    name="Student Score",
+    model={
+        "id": fields.Integer(required=True, description="Student ID"),
+        "score": fields.Integer(required=True, description="Student Score"),
+    },
+)
+
 update_multiple_course_students_scores_model = course_namespace.model(
     name="Update Multiple Students Grades for a Course",
     model={
-        "student1_id": fields.Integer( description="Student 1 ID"),
-        "score1": fields.Integer(description="Student 1 Score"),
-        "student2_id": fields.Integer(description="Student 2 ID"),
-        "score2": fields.Integer(description="Student 2 Score"),
-        "student3_id": fields.Integer(description="Student 3 ID"),
-        "score3": fields.Integer(description="Student 3 Score"),
-        "student4_id": fields.Integer(description="Student 4 ID"),
-        "score4": fields.Integer(description="Student 4 Score"),
-        "student5_id": fields.Integer(description="Student 5 ID"),
-        "score5": fields.Integer(description="Student 5 Score"),
-        "student6_id": fields.Integer(description="Student 6 ID"),
-        "score6": fields.Integer(description="Student 6 Score"),
-        "student7_id": fields.Integer(description="Student 7 ID"),
-        "score7": fields.Integer(description="Student 7 Score"),
-        "student8_id": fields.Integer(description="Student 8 ID"),
-        "score8": fields.Integer(description="Student 8 Score"),
-        "student9_id": fields.Integer(description="Student 9 ID"),
-        "score9": fields.Integer(description="Student 9 Score"),
-        "student10_id": fields.Integer(description="Student 10 ID"),
-        "score10": fields.Integer(description="Student 10 Score"),
+        "scores": fields.List(fields.Nested(student_score_model), required=True, description="Students Scores"),
+    },
+)
+
+
+
+# GRADE UPLOAD JOB SCHEMA MODEL
+grade_upload_error_model = course_namespace.model(
+    name="Grade Upload Error",
+    model={
+        "row": fields.Integer(description="Row Number, Header Excluded"),
+        "message": fields.String(description="Reason the Row was not Graded"),
     },
 )
 
+grade_upload_job_model = course_namespace.model(
+    name="Grade Upload Job",
+    model={
+        "id": fields.Integer(description="Job ID"),
+        "course_id": fields.Integer(description="Course ID"),
+        "status": fields.String(description="Job Status", enum=["pending", "running", "completed", "failed"]),
+        "total_rows": fields.Integer(description="Rows Uploaded"),
+        "graded_rows": fields.Integer(description="Rows Graded"),
+        "failed_rows": fields.Integer(description="Rows not Graded"),
+        "errors": fields.List(fields.Nested(grade_upload_error_model), description="Rows not Graded"),
+        "created_by": fields.String(description="Uploader's Username"),
+        "created_on": fields.DateTime(description="Upload Date"),
+        "finished_on": fields.DateTime(description="Completion Date"),
+    },
+)
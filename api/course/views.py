@@ -1,10 +1,18 @@
+from flask import current_app, request, url_for
 from flask_restx import Resource, abort
 from flask_jwt_extended import jwt_required, current_user
-from api.utils.calc_func import calc_scored_point, get_score_grade
-from api.utils.query_func import check_course_code_exist, check_course_exist, check_student_exist, check_student_registered_course, get_all_courses, get_course_students, get_course_details_by_id, get_courses_students_by_id_list, get_student_course_detail_by_id, get_student_registered_course_by_id
-from ..course.schemas import course_model, new_course_model, course_students_model, course_students_grades_model, update_multiple_course_students_scores_model
+from api.utils import db
+from api.utils.auth_func import admin_required
+from api.utils.calc_func import clean_id_scores, write_course_scores
+from api.utils.job_func import job_runner
+from api.utils.pagination import get_page, page_headers, page_parser
+from api.utils.serializer import fast_marshal_with
+from api.utils.stream_func import stream_json_list
+from api.utils.upload_func import read_score_rows, run_grade_upload_job
+from api.utils.query_func import check_course_code_exist, check_course_exist, get_all_courses, get_course_students, get_course_details_by_id, get_course_registrations, get_courses_students_by_id_list, get_student_course_detail_by_id
+from ..course.schemas import course_model, new_course_model, course_students_model, course_students_grades_model, update_multiple_course_students_scores_model, grade_upload_job_model
 from ..course import course_namespace
-from ..models import Course, StudentCourseScore
+from ..models import Course, StudentCourseScore, GradeUploadJob
 from http import HTTPStatus
 
 
@@ -43,7 +51,8 @@ class CreateGetCourse(Resource):
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only")
 
     # GET ALL COURSES
-    @course_namespace.marshal_with(course_model)
+    @course_namespace.expect(page_parser)
+    @fast_marshal_with(course_namespace, course_model)
     @course_namespace.doc(description="Retrieve All Courses (Admin Only)")
     @jwt_required()
     def get(self):
@@ -51,16 +60,31 @@ class CreateGetCourse(Resource):
         Admin: Get All Courses
         """
         if current_user.is_admin:
-            courses = get_all_courses()
-            return courses, HTTPStatus.OK
+            courses = get_all_courses(get_page())
+            return courses, HTTPStatus.OK, page_headers(courses)
         
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only")
 
 
+"""EXPORT ALL COURSES (ADMIN ONLY)"""
+@course_namespace.route("/export")
+class ExportCourses(Resource):
+    @course_namespace.response(HTTPStatus.OK, "All Courses, Streamed", [course_model])
+    @course_namespace.doc(description="Export All Courses as a Streamed JSON Array (Admin Only)")
+    @admin_required()
+    def get(self):
+        """
+        Admin: Export All Courses
+        """
+        courses = get_all_courses(yield_per=current_app.config["STREAM_YIELD_PER"])
+        return stream_json_list(courses, course_model)
+
+
 """GET ALL STUDENTS REGISTERED FOR A COURSE"""
 @course_namespace.route("/<int:course_id>/students")
 class GetCourseStudents(Resource):
-    @course_namespace.marshal_with(course_students_model)
+    @course_namespace.expect(page_parser)
+    @fast_marshal_with(course_namespace, course_students_model)
     @course_namespace.doc(description="Retrieve Specific Course Students (Admin Only)", params=dict(course_id="Course ID"))
     @jwt_required()
     def get(self, course_id):
@@ -69,8 +93,8 @@ class GetCourseStudents(Resource):
         """
         if current_user.is_admin:
             if check_course_exist(course_id):
-                course_students = get_course_students(course_id)
-                return course_students, HTTPStatus.OK            
+                course_students = get_course_students(course_id, get_page())
+                return course_students, HTTPStatus.OK, page_headers(course_students)            
             abort(HTTPStatus.NOT_FOUND, message="Course ID Not Found")
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only")
 
@@ -80,15 +104,16 @@ class GetCourseStudents(Resource):
 class GetUpdateCourseStudentsGrades(Resource):
 
     # GET ALL STUDENTS GRADES FOR A COURSE
-    @course_namespace.marshal_with(course_students_grades_model)
+    @course_namespace.expect(page_parser)
+    @fast_marshal_with(course_namespace, course_students_grades_model)
     @course_namespace.doc(description="Retrieve All Student Grades for a Course (Admin Only)")
     @jwt_required()
     def get(self, course_id):
         """Admin: Get All Students Grades for a Specific Course"""
         if current_user.is_admin:
             if check_course_exist(course_id):
-                course_students = get_course_students(course_id)
-                return course_students, HTTPStatus.OK            
+                course_students = get_course_students(course_id, get_page())
+                return course_students, HTTPStatus.OK, page_headers(course_students)            
             abort(HTTPStatus.NOT_FOUND, message="Course ID Not Found")
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only")
 
@@ -101,28 +126,75 @@ class GetUpdateCourseStudentsGrades(Resource):
         """Admin: Update Multiple Students Grades for a Course"""
         if current_user.is_admin:
             if check_course_exist(course_id):
-                data = course_namespace.payload
-                student_ids = []
-                score_list = []
-                for key in data.keys():
-                    if key.startswith("student"):
-                        student_ids.append(data[key])
-                    if key.startswith("score"):
-                        score_list.append(data[key])
-
-                i = 0
-                while i < len(student_ids):
-                    if check_student_exist(student_ids[i]):
-                        if check_student_registered_course(student_ids[i], course_id):
-                            student_course = get_student_registered_course_by_id(student_ids[i], course_id)
-
-                            student_course.score = score_list[i]
-                            student_course.grade, student_course.grade_point = get_score_grade(student_ids[i], course_id, score_list[i])
-                            student_course.scored_point = calc_scored_point(student_ids[i], course_id)
-                            student_course.update_db()
-                    i += 1
+                if not isinstance(course_namespace.payload, dict):
+                    abort(HTTPStatus.BAD_REQUEST, message="Send a JSON object with the scores")
+                try:
+                    scores = clean_id_scores(course_namespace.payload.get("scores"))
+                except ValueError as error:
+                    abort(HTTPStatus.BAD_REQUEST, message=str(error))
+                student_ids = list(scores)
+
+                # all the students validated with one query
+                registrations = get_course_registrations(course_id, student_ids)
+                not_registered = set(student_ids) - {registration.student_id for registration in registrations}
+                if not_registered:
+                    abort(HTTPStatus.NOT_FOUND, message=f"Students not registered for the course: {sorted(not_registered)}")
+
+                write_course_scores(
+                    [(registration, scores[registration.student_id]) for registration in registrations],
+                    current_user.username,
+                )
                 # response data
                 course_students = get_courses_students_by_id_list(student_ids, course_id)
                 return course_students, HTTPStatus.OK
             abort(HTTPStatus.CONFLICT, message="Course does not exist.")
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only")
+
+
+"""UPLOAD STUDENTS GRADES FOR A COURSE FROM A CSV (ADMIN ONLY)"""
+@course_namespace.route("/grades/<int:course_id>/upload", doc={"params": dict(course_id="Course ID")})
+class UploadCourseStudentsGrades(Resource):
+    @course_namespace.marshal_with(grade_upload_job_model)
+    @course_namespace.doc(
+        description="Upload Students Scores for a Course as a text/csv Body with a Header Row of "
+        "matric_no or student_id, and score. Large Uploads are Graded in the Background (Admin Only)"
+    )
+    @admin_required()
+    def post(self, course_id):
+        """Admin: Upload Students Grades for a Course"""
+        if not check_course_exist(course_id):
+            abort(HTTPStatus.NOT_FOUND, message="Course ID Not Found")
+        if request.mimetype != "text/csv":
+            abort(HTTPStatus.BAD_REQUEST, message="Send a text/csv body of scores")
+
+        if request.content_length is None:
+            abort(HTTPStatus.LENGTH_REQUIRED, message="Send the scores with a Content-Length")
+        if request.max_content_length is not None and request.content_length > request.max_content_length:
+            abort(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, message=f"Send at most {request.max_content_length} bytes of scores")
+
+        rows = read_score_rows(request.stream)
+        job = GradeUploadJob(course_id=course_id, total_rows=len(rows), created_by=current_user.username)
+        job.save_to_db()
+
+        if len(rows) > current_app.config["GRADE_UPLOAD_BACKGROUND_ROWS"]:
+            job_runner.submit(run_grade_upload_job, job.id, rows)
+            location = url_for("grade_upload_job", job_id=job.id)
+            return job, HTTPStatus.ACCEPTED, {"Location": location}
+        run_grade_upload_job(job.id, rows)
+        return job, HTTPStatus.OK
+
+
+"""GET GRADE UPLOAD JOB STATUS (ADMIN ONLY)"""
+@course_namespace.route(
+    "/grades/jobs/<int:job_id>", endpoint="grade_upload_job", doc={"params": dict(job_id="Grade Upload Job ID")}
+)
+class GradeUploadJobStatus(Resource):
+    @course_namespace.marshal_with(grade_upload_job_model)
+    @course_namespace.doc(description="Retrieve the Status of a Grade Upload (Admin Only)")
+    @admin_required()
+    def get(self, job_id):
+        """Admin: Get Grade Upload Status"""
+        job = db.session.get(GradeUploadJob, job_id)
+        if job is None:
+            abort(HTTPStatus.NOT_FOUND, message="Grade Upload Job Not Found")
+        return job, HTTPStatus.OK
@@ -10,7 +10,7 @@ create_defaults()
 def create_defaults():
 
     from decouple import config
-    from werkzeug.security import generate_password_hash
+    from .utils.password_func import hash_password
     from datetime import datetime
 
     db.drop_all()
@@ -30,7 +30,7 @@ def create_defaults():
         gender="MALE",
         email="superadmin@sm.com",
         username="super.admin",
-        password_hash=generate_password_hash(config("DEFAULT_SUPERADMIN_PASSWORD")),
+        password_hash=hash_password(config("DEFAULT_SUPERADMIN_PASSWORD")),
         type="user",
         department_id=1,
         created_on=datetime.utcnow(),
@@ -45,7 +45,8 @@ def create_defaults():
         gender="MALE",
         email="admin@sm.com",
         username="admin",
-        password_hash=generate_password_hash(config("DEFAULT_ADMIN_PASSWORD")),
+        password_hash=hash_password(config("DEFAULT_ADMIN_PASSWORD")),
+        must_change_password=True,
         type="user",
         department_id=1,
         created_on=datetime.utcnow(),
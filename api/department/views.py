@@ -2,6 +2,8 @@ from flask_restx import Resource, abort
 from flask_jwt_extended import jwt_required, current_user
 from ..models import Department
 from api.utils.query_func import check_department_exist, get_all_departments
+from api.utils.pagination import get_page, page_headers, page_parser
+from api.utils.serializer import fast_marshal_with
 from ..department.schemas import department_model
 from ..department import department_namespace
 from http import HTTPStatus
@@ -37,7 +39,8 @@ class CreateGetDepartment(Resource):
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only")
 
     # GET ALL DEPARTMENTS
-    @department_namespace.marshal_with(department_model)
+    @department_namespace.expect(page_parser)
+    @fast_marshal_with(department_namespace, department_model)
     @department_namespace.doc(description="Retrieve All Department (Admin Only)")
     @jwt_required()
     def get(self):
@@ -46,6 +49,6 @@ class CreateGetDepartment(Resource):
         """
         
         if current_user.is_admin:
-            departments = get_all_departments()
-            return departments, HTTPStatus.OK        
+            departments = get_all_departments(get_page())
+            return departments, HTTPStatus.OK, page_headers(departments)        
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only")
\ No newline at end of file
@@ -1,3 +1,6 @@
 from .users import User, Student, Teacher
 from .courses import Department, Course
-from .grading import GradeScale, StudentCourseScore, StudentRecord
+from .grading import GradeScale, StudentCourseScore, StudentCourseView, StudentRecord
+from .blocklist import TokenBlocklist
+from .sequences import CodeSequence
+from .jobs import GradeUploadJob
@@ -0,0 +1,16 @@
+from ..utils import db
+from ..utils.db_func import DB_Func
+from datetime import datetime
+
+
+class TokenBlocklist(db.Model, DB_Func):
+    __tablename__ = "token_blocklist"
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=False, unique=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    created_on = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Blocked Token JTI: {self.jti}>"
@@ -15,8 +15,9 @@ class Department(db.Model, DB_Func):
     modified_by = db.Column(db.String())
     modified_on = db.Column(db.DateTime, onupdate=datetime.utcnow())
     
-    courses = db.relationship("Course", backref="co_department", lazy=True)
-    users = db.relationship("User", backref="user_department", lazy=True)
+    # relationships are never loaded implicitly; a query that needs them loads them explicitly
+    courses = db.relationship("Course", backref=db.backref("co_department", lazy="raise"), lazy="raise")
+    users = db.relationship("User", backref=db.backref("user_department", lazy="raise"), lazy="raise")
 
     def __repr__(self):
         return f"<Department Name: {self.name}>"
@@ -42,7 +43,7 @@ class Course(db.Model, DB_Func):
     modified_by = db.Column(db.String())
     modified_on = db.Column(db.DateTime, onupdate=datetime.utcnow())
     
-    course_students = db.relationship("StudentCourseScore", backref="course", lazy=True)
+    course_students = db.relationship("StudentCourseScore", backref=db.backref("course", lazy="raise"), lazy="raise")
 
     def __repr__(self):
         return f"<Course Name: {self.name}>"
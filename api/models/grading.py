@@ -1,6 +1,7 @@
 from sqlalchemy import func
 from ..utils import db
 from ..utils.db_func import DB_Func
+from .users import Gender
 # from ..utils.calc_func import Record_Func
 from datetime import datetime
 
@@ -48,6 +49,13 @@ class StudentCourseScore(db.Model, DB_Func):
     modified_by = db.Column(db.String())
     modified_on = db.Column(db.DateTime, onupdate=datetime.utcnow())
 
+    __table_args__ = (
+        # a student registers for a course once; also serves the lookups by student_id alone
+        db.UniqueConstraint("student_id", "course_id", name="uq_student_courses_scores_student_id_course_id"),
+        # a course's students, best scores first
+        db.Index("ix_student_courses_scores_course_id_score", course_id, score.desc(), student_id),
+    )
+
     def __repr__(self):
         return f"<Student ID: {self.student_id}, Course ID: {self.course_id}, Grade: {self.grade}>"
 
@@ -60,11 +68,49 @@ class StudentCourseScore(db.Model, DB_Func):
         return student_course
 
 
+class StudentCourseView(db.Model):
+    """
+    Read model of the student courses details: one row per registration, with the student,
+    course, department and teacher columns the detail routes return already joined.
+    Written only by `refresh_student_course_view`, from the write paths and `flask records rebuild-view`.
+    """
+    __tablename__ = "student_course_view"
+
+    id = db.Column(db.Integer, primary_key=True)  # the StudentCourseScore ID
+    student_id = db.Column(db.Integer, nullable=False)
+    matric_no = db.Column(db.String(12))
+    student_name = db.Column(db.String())
+    gender = db.Column(db.Enum(Gender))
+    department_id = db.Column(db.Integer, index=True)
+    course_id = db.Column(db.Integer, nullable=False)
+    course_code = db.Column(db.String(6))
+    course_name = db.Column(db.String(255))
+    course_credit = db.Column(db.Integer)
+    department_name = db.Column(db.String(255))
+    teacher = db.Column(db.String())
+
+    registered_on = db.Column(db.DateTime)
+    registered_by = db.Column(db.String())
+    score = db.Column(db.Integer)
+    grade = db.Column(db.String)
+    grade_point = db.Column(db.Integer)
+    scored_point = db.Column(db.Integer)
+
+    __table_args__ = (
+        db.UniqueConstraint("student_id", "course_id", name="uq_student_course_view_student_id_course_id"),
+        # a course's students, best scores first and the ungraded (NULL) last, as `get_course_students` sorts them
+        db.Index("ix_student_course_view_course_id_score", course_id, db.func.coalesce(score, -1).desc(), student_id),
+    )
+
+    def __repr__(self):
+        return f"<Student ID: {self.student_id}, Course ID: {self.course_id}>"
+
+
 class StudentRecord(db.Model, DB_Func):
     __tablename__ = "students_records"
 
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey("students.student_id"))
+    student_id = db.Column(db.Integer, db.ForeignKey("students.student_id"), index=True)
     matric_no = db.Column(db.String(12), unique=False, nullable=False)
     department_id = db.Column(db.Integer, db.ForeignKey("departments.id"))
     
@@ -0,0 +1,28 @@
+from ..utils import db
+from ..utils.db_func import DB_Func
+from datetime import datetime
+
+
+class GradeUploadJob(db.Model, DB_Func):
+    __tablename__ = "grade_upload_jobs"
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    graded_rows = db.Column(db.Integer, nullable=False, default=0)
+    failed_rows = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.JSON, nullable=True)
+
+    created_by = db.Column(db.String())
+    created_on = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_on = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<Grade Upload Job: {self.id}, Course ID: {self.course_id}, Status: {self.status}>"
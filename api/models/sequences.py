@@ -0,0 +1,11 @@
+from ..utils import db
+
+
+class CodeSequence(db.Model):
+    __tablename__ = "code_sequences"
+
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False, default=1)
+
+    def __repr__(self):
+        return f"<Code Sequence: {self.name}, Next Value: {self.next_value}>"
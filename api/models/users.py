@@ -1,5 +1,6 @@
 from ..utils import db
 from ..utils.db_func import DB_Func
+from ..utils.user_cache import user_cache
 from datetime import datetime
 from enum import Enum
 
@@ -37,6 +38,7 @@ class User(db.Model, DB_Func):
     is_active = db.Column(db.Boolean, default=True)
     is_staff = db.Column(db.Boolean, default=False)
     is_admin = db.Column(db.Boolean, default=False)
+    must_change_password = db.Column(db.Boolean, default=False)
 
     __mapper_args__ = {
         "polymorphic_identity": "user",
@@ -51,9 +53,12 @@ class User(db.Model, DB_Func):
     def get_by_id(cls, id):
         return cls.query.get_or_404(id)
 
-    def generate_username(self, id, first_name, last_name) -> None:
-        self.username  = f"{first_name.lower()}.{last_name.lower()}{id}"
-        self.update_db()
+    def invalidate_cache(self) -> None:
+        user_cache.invalidate(self)
+
+    @staticmethod
+    def make_username(number, first_name, last_name) -> str:
+        return f"{first_name.lower()}.{last_name.lower()}{number}"
 
 
 class Student(User):
@@ -63,7 +68,8 @@ class Student(User):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     matric_no = db.Column(db.String(12), unique=True)
 
-    student_courses = db.relationship("StudentCourseScore", backref="student", lazy=True)
+    # never loaded implicitly, like every relationship; see Department
+    student_courses = db.relationship("StudentCourseScore", backref=db.backref("student", lazy="raise"), lazy="raise")
 
     __mapper_args__ = {
         "polymorphic_identity": "student",
@@ -76,11 +82,11 @@ class Student(User):
     def get_by_student_id(cls, student_id):
         return cls.query.filter(cls.student_id==student_id).first()
 
-    def generate_matric_no(self, student_id):
+    @staticmethod
+    def make_matric_no(number) -> str:
         year_str = str(datetime.utcnow().year)
         year_str = year_str[-3:]
-        self.matric_no = f"STU/{year_str}/{student_id:04d}"
-        self.update_db()
+        return f"STU/{year_str}/{number:04d}"
 
 
 class Teacher(User):
@@ -90,7 +96,7 @@ class Teacher(User):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     staff_code = db.Column(db.String(12), unique=True)
 
-    teacher_courses = db.relationship("Course", backref="teacher", lazy=True)
+    teacher_courses = db.relationship("Course", backref=db.backref("teacher", lazy="raise"), lazy="raise")
 
     __mapper_args__ = {
         "polymorphic_identity": "teacher",
@@ -103,8 +109,8 @@ class Teacher(User):
     def get_by_teacher_id(cls, teacher_id):
         return cls.query.filter(cls.teacher_id==teacher_id).first()
 
-    def generate_staff_code(self, teacher_id):
+    @staticmethod
+    def make_staff_code(number) -> str:
         year_str = str(datetime.utcnow().year)
         year_str = year_str[-3:]
-        self.staff_code = f"TCH/{year_str}/{teacher_id:04d}"
-        self.update_db()
+        return f"TCH/{year_str}/{number:04d}"
@@ -96,16 +96,7 @@ update_student_model = student_namespace.model(
 register_multiple_student_courses_model = student_namespace.model(
     name="Register Multiple Course for Student",
     model={
-        "course1": fields.Integer(description="Course 1"),
-        "course2": fields.Integer(description="Course 2"),
-        "course3": fields.Integer(description="Course 3"),
-        "course4": fields.Integer(description="Course 4"),
-        "course5": fields.Integer(description="Course 5"),
-        "course6": fields.Integer(description="Course 6"),
-        "course7": fields.Integer(description="Course 7"),
-        "course8": fields.Integer(description="Course 8"),
-        "course9": fields.Integer(description="Course 9"),
-        "course10": fields.Integer(description="Course 10"),
+        "course_ids": fields.List(fields.Integer, required=True, description="Course IDs"),
     },
 )
 
@@ -135,28 +126,35 @@ student_courses_grades_model = student_namespace.model(
 )
 
 
+course_score_model = student_namespace.model(
+    name="Course Score",
+    model={
+        "id": fields.Integer(required=True, description="Course ID"),
+        "score": fields.Integer(required=True, description="Course Score"),
+    },
+)
+
 update_multiple_student_courses_scores_model = student_namespace.model(
     name="Update Multiple Courses Grades for a Student",
     model={
-        "course1_id": fields.Integer( description="Course 1 ID"),
-        "score1": fields.Integer(description="Course 1 Score"),
-        "course2_id": fields.Integer(description="Course 2 ID"),
-        "score2": fields.Integer(description="Course 2 Score"),
-        "course3_id": fields.Integer(description="Course 3 ID"),
-        "score3": fields.Integer(description="Course 3 Score"),
-        "course4_id": fields.Integer(description="Course 4 ID"),
-        "score4": fields.Integer(description="Course 4 Score"),
-        "course5_id": fields.Integer(description="Course 5 ID"),
-        "score5": fields.Integer(description="Course 5 Score"),
-        "course6_id": fields.Integer(description="Course 6 ID"),
-        "score6": fields.Integer(description="Course 6 Score"),
-        "course7_id": fields.Integer(description="Course 7 ID"),
-        "score7": fields.Integer(description="Course 7 Score"),
-        "course8_id": fields.Integer(description="Course 8 ID"),
-        "score8": fields.Integer(description="Course 8 Score"),
-        "course9_id": fields.Integer(description="Course 9 ID"),
-        "score9": fields.Integer(description="Course 9 Score"),
-        "course10_id": fields.Integer(description="Course 10 ID"),
-        "score10": fields.Integer(description="Course 10 Score"),
+        "scores": fields.List(fields.Nested(course_score_model), required=True, description="Courses Scores"),
+    },
+)
+
+
+enroll_students_model = student_namespace.model(
+    name="Enroll Students into Courses",
+    model={
+        "course_ids": fields.List(fields.Integer, required=True, description="Course IDs"),
+        "department_id": fields.Integer(description="Enroll Every Student of this Department"),
+        "student_ids": fields.List(fields.Integer, description="Or Enroll these Students"),
+    },
+)
+
+enroll_result_model = student_namespace.model(
+    name="Enrollment Result",
+    model={
+        "students": fields.Integer(description="Students in the Cohort"),
+        "registered": fields.Integer(description="Registrations Created"),
     },
 )
@@ -1,8 +1,9 @@
 from ..student import student_namespace
+from flask import current_app
 from flask_restx import Resource, abort
 from http import HTTPStatus
-from flask_jwt_extended import current_user, jwt_required, get_jwt_identity
-from ..models import Student, StudentCourseScore, Course, StudentRecord
+from flask_jwt_extended import current_user, jwt_required
+from ..models import StudentCourseScore, StudentRecord
 from ..student.schemas import (
     student_model,
     update_student_model,
@@ -12,11 +13,12 @@ from ..student.schemas import (
     student_grades_model,
     register_multiple_student_courses_model,
     student_courses_grades_model,
-    update_multiple_student_courses_scores_model
+    update_multiple_student_courses_scores_model,
+    enroll_students_model,
+    enroll_result_model,
 )
 from ..utils.query_func import (
     check_course_exist,
-    check_student_registered_course,
     check_student_exist,
     get_all_students,
     get_all_students_records,
@@ -24,33 +26,38 @@ from ..utils.query_func import (
     get_student_courses_details,
     get_student_course_detail_by_id,
     get_student_registered_course_by_id,
+    get_student_registrations,
+    get_courses_by_id_list,
+    get_student,
+    get_student_details,
     get_student_records,
     check_email_exist,
 )
-from ..utils.calc_func import (
-    calc_course_count,
-    calc_total_credits,
-    get_score_grade,
-    calc_scored_point,
-    calc_total_points,
-    calc_student_gpa_honours,
-)
+from sqlalchemy import delete, insert
+from ..utils import db
+from ..utils.auth_func import admin_required
+from ..utils.enroll_func import enroll_students
+from ..utils.pagination import get_page, page_headers, page_parser
+from ..utils.serializer import fast_marshal_with
+from ..utils.stream_func import stream_json_list
+from ..utils.view_func import refresh_student_course_view
+from ..utils.calc_func import apply_record_delta, clean_id_scores, get_score_grade, is_integer, set_course_score, write_course_scores
 
 
 """GET ALL STUDENTS"""
 @student_namespace.route("/")
 class Students(Resource):
-    @student_namespace.marshal_with(student_model)
+    @student_namespace.expect(page_parser)
+    @fast_marshal_with(student_namespace, student_model)
     @student_namespace.doc(description="Retrieve All Students (Admin Only) or Current Student (Students Only)")
     @jwt_required()
     def get(self):
         """Get All Students (Admin Only) | Current Student (Student Only)"""
         if current_user.is_admin:
-            students = get_all_students()
-            return students, HTTPStatus.OK
+            students = get_all_students(get_page())
+            return students, HTTPStatus.OK, page_headers(students)
         elif current_user.type == "student":
-            student = Student.query.filter_by(username=get_jwt_identity()).first()
-            student = Student.get_by_student_id(student.student_id)
+            student = get_student_details(current_user.student_id)
             return student, HTTPStatus.OK
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only.")
 
@@ -66,7 +73,7 @@ class GetUpdateDeleteSpecificStudent(Resource):
     def get(self, student_id):
         """Admin: Get Student by ID"""
         if current_user.is_admin:
-            student = Student.get_by_student_id(student_id)
+            student = get_student_details(student_id)
             return student, HTTPStatus.OK
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only.")
 
@@ -78,7 +85,7 @@ class GetUpdateDeleteSpecificStudent(Resource):
     def put(self, student_id):
         """Admin: Update Any or All 3 Student Detail by ID"""
         if current_user.is_admin:
-            student = Student.get_by_student_id(student_id)
+            student = get_student(student_id)
             data = student_namespace.payload
             # check if first name is provided
             if data.get("first_name"):
@@ -98,6 +105,8 @@ class GetUpdateDeleteSpecificStudent(Resource):
                     abort(HTTPStatus.CONFLICT, message="Email already exist.")
             else:
                 student.email = student.email
+            # the student name is copied into the student course view
+            refresh_student_course_view(StudentCourseScore.student_id, [student_id])
             student.update_db()
             return student, HTTPStatus.OK
 
@@ -109,8 +118,14 @@ class GetUpdateDeleteSpecificStudent(Resource):
     def delete(self, student_id):
         """Admin: Delete Student by ID"""
         if current_user.is_admin:
-            student = Student.get_by_student_id(student_id)
-            student.delete_from_db()
+            student = get_student(student_id)
+            # the view rows go in the same transaction, so delete_from_db is not used
+            student.invalidate_cache()
+            # the student record references the student, its registrations are kept without it
+            db.session.execute(delete(StudentRecord).where(StudentRecord.student_id == student_id))
+            db.session.delete(student)
+            refresh_student_course_view(StudentCourseScore.student_id, [student_id])
+            db.session.commit()
             return {"message": "Student Deleted Successfully!"}, HTTPStatus.OK
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only.")
 
@@ -127,36 +142,44 @@ class RegisterUnregisterStudentCourses(Resource):
         """Admin: Register Multiple Courses for a Student"""
         if current_user.is_admin:
             if check_student_exist(student_id):
-                student = Student.get_by_student_id(student_id)
-                data = student_namespace.payload
-                course_ids = []
-                i = 0
-                while i < len(data):
-                    i += 1                    
-                    if check_course_exist(data.get(f"course{i}")) and not check_student_registered_course(student_id, data.get(f"course{i}")):
-                        course_id = data.get(f"course{i}")
-                        course_ids.append(course_id)
-                        
-                        course = Course.get_by_id(course_id)
-                        student_course = StudentCourseScore(
-                            student_id=student_id,
-                            matric_no=student.matric_no,
-                            course_id=course_id,
-                            course_code=course.code,
-                            department_id=course.department_id,
-                            credit=course.credit,
-                            registered_by=current_user.username,
-                        )
-                        student_course.save_to_db()
-                        
-                        # update student records
-                        stu_record = StudentRecord.get_by_id(student_id)
-                        stu_record.course_count = calc_course_count(student_id)
-                        stu_record.total_credits = calc_total_credits(student_id)
-                        stu_record.update_db()
+                student = get_student(student_id)
+                course_ids = read_course_ids(student_namespace.payload)
+
+                # the courses and the existing registrations fetched in two queries
+                courses = get_courses_by_id_list(course_ids)
+                check_courses_found(course_ids, courses)
+                registered = {registration.course_id for registration in get_student_registrations(student_id, course_ids)}
+                new_courses = [course for course in courses if course.id not in registered]
+
+                if new_courses:
+                    db.session.execute(
+                        insert(StudentCourseScore),
+                        [
+                            dict(
+                                student_id=student_id,
+                                matric_no=student.matric_no,
+                                course_id=course.id,
+                                course_code=course.code,
+                                department_id=course.department_id,
+                                credit=course.credit,
+                                registered_by=current_user.username,
+                            )
+                            for course in new_courses
+                        ],
+                    )
+                    # update student records
+                    apply_record_delta(
+                        student_id,
+                        course_count=len(new_courses),
+                        credits=sum(course.credit for course in new_courses),
+                    )
+                    refresh_student_course_view(StudentCourseScore.student_id, [student_id])
+                    db.session.commit()
                 # response data
-                student_courses = get_student_courses_by_id_list(student_id, course_ids)
+                student_courses = get_student_courses_by_id_list(student_id, [course.id for course in new_courses])
                 return student_courses, HTTPStatus.CREATED
+            abort(HTTPStatus.CONFLICT, message=f"Student with {student_id} does not exist")
+        abort(HTTPStatus.UNAUTHORIZED, message="Admin Only.")
 
 
     # UNREGISTER MULTIPLE COURSES FOR A STUDENT
@@ -167,51 +190,98 @@ class RegisterUnregisterStudentCourses(Resource):
         """Admin: Unregister Multiple Courses for a Student"""
         if current_user.is_admin:
             if check_student_exist(student_id):
-                student = Student.get_by_student_id(student_id)
-                data = student_namespace.payload
-                course_ids = []
-                i = 0
-                while i < len(data):
-                    i += 1                    
-                    if check_course_exist(data.get(f"course{i}")) and check_student_registered_course(student_id, data.get(f"course{i}")):
-                        course_id = data.get(f"course{i}")
-                        course_ids.append(course_id)
-                        
-                        student_course = get_student_registered_course_by_id(student_id, course_id)
-                        student_course.delete_from_db()
-                        # update student records
-                        stu_record = StudentRecord.get_by_id(student_id)
-                        stu_record.course_count = calc_course_count(student_id)
-                        stu_record.total_credits = calc_total_credits(student_id)
-                        stu_record.update_db()
+                course_ids = read_course_ids(student_namespace.payload)
+
+                check_courses_found(course_ids, get_courses_by_id_list(course_ids))
+                registrations = get_student_registrations(student_id, course_ids)
+
+                if registrations:
+                    db.session.execute(
+                        delete(StudentCourseScore)
+                        .where(StudentCourseScore.id.in_([registration.id for registration in registrations]))
+                        .execution_options(synchronize_session=False)
+                    )
+                    # update student records
+                    apply_record_delta(
+                        student_id,
+                        course_count=-len(registrations),
+                        credits=-sum(registration.credit for registration in registrations),
+                        points=-sum(registration.scored_point or 0 for registration in registrations),
+                    )
+                    refresh_student_course_view(StudentCourseScore.student_id, [student_id])
+                    db.session.commit()
                 return {"message": "Courses unregistered successfully"}, HTTPStatus.OK            
             abort(HTTPStatus.CONFLICT, message=f"Student with {student_id} does not exist")
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only.")
 
 
+"""COHORT ENROLLMENT INTO COURSES (ADMIN ONLY)"""
+@student_namespace.route("/enroll")
+class EnrollStudentsCourses(Resource):
+    @student_namespace.expect(enroll_students_model)
+    @student_namespace.marshal_with(enroll_result_model)
+    @student_namespace.doc(description="Register a Department or a List of Students into Courses (Admin Only)")
+    @admin_required()
+    def post(self):
+        """Admin: Enroll a Cohort of Students into Courses"""
+        data = student_namespace.payload or {}
+        course_ids = read_course_ids(data)
+        student_ids = data.get("student_ids")
+        if student_ids is not None and not (
+            isinstance(student_ids, list) and all(is_integer(student_id) for student_id in student_ids)
+        ):
+            abort(HTTPStatus.BAD_REQUEST, message="student_ids must be a list of integers")
+        if data.get("department_id") is not None and not is_integer(data["department_id"]):
+            abort(HTTPStatus.BAD_REQUEST, message="department_id must be an integer")
+        try:
+            result = enroll_students(
+                course_ids,
+                current_user.username,
+                department_id=data.get("department_id"),
+                student_ids=student_ids,
+            )
+        except ValueError as error:
+            abort(HTTPStatus.BAD_REQUEST, message=str(error))
+        return result, HTTPStatus.CREATED
+
+
+def read_course_ids(data) -> list:
+    """function to validate a {"course_ids": [...]} payload, of any length."""
+    course_ids = data.get("course_ids") if isinstance(data, dict) else None
+    if not isinstance(course_ids, list) or not course_ids or not all(is_integer(course_id) for course_id in course_ids):
+        abort(HTTPStatus.BAD_REQUEST, message="Send a non-empty list of integer course_ids")
+    return list(dict.fromkeys(course_ids))
+
+
+def check_courses_found(course_ids, courses) -> None:
+    not_found = set(course_ids) - {course.id for course in courses}
+    if not_found:
+        abort(HTTPStatus.NOT_FOUND, message=f"Courses not found: {sorted(not_found)}")
+
+
 """GET STUDENT REGISTERED COURSES (STUDENTS & ADMIN ONLY)"""
 @student_namespace.route("/courses/student", 
     doc={"description": "Retrieve Student Registered Courses (Student Only Route)"})
 @student_namespace.route("/courses/<int:student_id>", 
     doc={"description": "Retrieve Student Registered Courses (Admin Only Route)", "params": dict(student_id="Student ID")})
 class StudentCourses(Resource):
-    @student_namespace.marshal_with(student_course_model)
+    @student_namespace.expect(page_parser)
+    @fast_marshal_with(student_namespace, student_course_model)
     @jwt_required()
     def get(self, student_id=None):
         """Get Student's Registered Courses"""
         if student_id:
             if current_user.is_admin:
                 if check_student_exist(student_id):
-                    student_courses = get_student_courses_details(student_id)
-                    return student_courses, HTTPStatus.OK
+                    student_courses = get_student_courses_details(student_id, get_page())
+                    return student_courses, HTTPStatus.OK, page_headers(student_courses)
                 abort(HTTPStatus.NOT_FOUND, message="Please provide a Valid Student ID")
             abort(HTTPStatus.UNAUTHORIZED, message="Admin Only.")
 
         else:
             if current_user.type == "student":
-                student = Student.query.filter_by(username=current_user.username).first()
-                student_courses = get_student_courses_details(student.student_id)
-                return student_courses, HTTPStatus.OK
+                student_courses = get_student_courses_details(current_user.student_id, get_page())
+                return student_courses, HTTPStatus.OK, page_headers(student_courses)
             abort(HTTPStatus.UNAUTHORIZED, message="Student Only")
 
 
@@ -234,19 +304,13 @@ class GetUpdateStudentCourseGrade(Resource):
                 # check if student registered for the course
                 if student_course:
                     data = student_namespace.payload
+                    if get_score_grade(data["score"])[0] is None:
+                        abort(HTTPStatus.BAD_REQUEST, message=f"No grade covers the score {data['score']}")
 
-                    # updating the student course score table
-                    student_course.score = data["score"]
-                    student_course.grade, student_course.grade_point = get_score_grade(student_id, course_id, data["score"])
-                    student_course.scored_point = calc_scored_point(student_id, course_id)
+                    # updating the student course score and the student records tables
+                    set_course_score(student_course, data["score"])
                     student_course.update_db()
                     
-                    # updating the student records table
-                    student_records = StudentRecord.get_by_id(student_id)
-                    student_records.total_points = calc_total_points(student_id)
-                    student_records.gpa, student_records.honours = calc_student_gpa_honours(student_id)
-                    student_records.update_db()
-                    
                     # response data
                     student_course_detail = get_student_course_detail_by_id(student_id, course_id)
                     return student_course_detail, HTTPStatus.OK
@@ -273,15 +337,16 @@ class GetUpdateStudentCourseGrade(Resource):
 class GetUpdateCourseStudentsGrades(Resource):
 
     # GET ALL EGISTERED COURSES GRADES FOR A STUDENT
-    @student_namespace.marshal_with(student_courses_grades_model)
+    @student_namespace.expect(page_parser)
+    @fast_marshal_with(student_namespace, student_courses_grades_model)
     @student_namespace.doc(description="Retrieve All Courses Grades for a Student (Admin Only)")
     @jwt_required()
     def get(self, student_id):
         """Admin: Get All Course Grades for a Specific Student"""
         if current_user.is_admin:
             if check_student_exist(student_id):
-                student_courses = get_student_courses_details(student_id)
-                return student_courses, HTTPStatus.OK            
+                student_courses = get_student_courses_details(student_id, get_page())
+                return student_courses, HTTPStatus.OK, page_headers(student_courses)            
             abort(HTTPStatus.NOT_FOUND, message="Student ID Not Found")
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only")
 
@@ -294,26 +359,25 @@ class GetUpdateCourseStudentsGrades(Resource):
         """Admin: Update Multiple Courses Grades for a Student"""
         if current_user.is_admin:
             if check_student_exist(student_id):
-                data = student_namespace.payload
-                course_ids = []
-                score_list = []
-                for key in data.keys():
-                    if key.startswith("course"):
-                        course_ids.append(data[key])
-                    if key.startswith("score"):
-                        score_list.append(data[key])
-
-                i = 0
-                while i < len(course_ids):
-                    if check_course_exist(course_ids[i]):
-                        if check_student_registered_course(student_id, course_ids[i]):
-                            student_course = get_student_registered_course_by_id(student_id, course_ids[i])
-
-                            student_course.score = score_list[i]
-                            student_course.grade, student_course.grade_point = get_score_grade(student_id, course_ids[i], score_list[i])
-                            student_course.scored_point = calc_scored_point(student_id, course_ids[i])
-                            student_course.update_db()
-                    i += 1
+                if not isinstance(student_namespace.payload, dict):
+                    abort(HTTPStatus.BAD_REQUEST, message="Send a JSON object with the scores")
+                try:
+                    scores = clean_id_scores(student_namespace.payload.get("scores"))
+                except ValueError as error:
+                    abort(HTTPStatus.BAD_REQUEST, message=str(error))
+                course_ids = list(scores)
+
+                # all the courses validated with one query
+                registrations = get_student_registrations(student_id, course_ids)
+                not_registered = set(course_ids) - {registration.course_id for registration in registrations}
+                if not_registered:
+                    abort(HTTPStatus.NOT_FOUND, message=f"Courses not registered for the student: {sorted(not_registered)}")
+
+                # scores and student records updated in one transaction
+                write_course_scores(
+                    [(registration, scores[registration.course_id]) for registration in registrations],
+                    current_user.username,
+                )
                 # response data
                 course_students = get_student_courses_by_id_list(student_id, course_ids)
                 return course_students, HTTPStatus.OK
@@ -326,23 +390,23 @@ class GetUpdateCourseStudentsGrades(Resource):
 @student_namespace.route("/grades/<int:student_id>",
     doc={"description": "Retrieve Student Grades for Registered Courses (Admin Only)", "params": dict(student_id="Student ID")})
 class StudentCourseGrades(Resource):
-    @student_namespace.marshal_with(student_grades_model)
+    @student_namespace.expect(page_parser)
+    @fast_marshal_with(student_namespace, student_grades_model)
     @jwt_required()
     def get(self, student_id=None):
         """Get Student Grades for Registered Courses"""
         if student_id:
             if current_user.is_admin:
                 if check_student_exist(student_id):
-                    student_grades = get_student_courses_details(student_id)
-                    return student_grades, HTTPStatus.OK
+                    student_grades = get_student_courses_details(student_id, get_page())
+                    return student_grades, HTTPStatus.OK, page_headers(student_grades)
                 abort(HTTPStatus.NOT_FOUND, message="Please provide a Valid Student ID")
             abort(HTTPStatus.UNAUTHORIZED, message="Admin Only.")
 
         else:
             if current_user.type == "student":
-                student = Student.query.filter_by(username=current_user.username).first()
-                student_grades = get_student_courses_details(student.student_id)
-                return student_grades, HTTPStatus.OK
+                student_grades = get_student_courses_details(current_user.student_id, get_page())
+                return student_grades, HTTPStatus.OK, page_headers(student_grades)
             abort(HTTPStatus.UNAUTHORIZED, message="Student Only")
 
 
@@ -365,8 +429,7 @@ class GetStudentRecords(Resource):
 
         else:
             if current_user.type == "student":
-                student = Student.query.filter_by(username=current_user.username).first()
-                student_records = get_student_records(student.student_id)
+                student_records = get_student_records(current_user.student_id)
                 return student_records, HTTPStatus.OK
             abort(HTTPStatus.UNAUTHORIZED, message="Student Only")
 
@@ -374,13 +437,26 @@ class GetStudentRecords(Resource):
 """GET ALL STUDENTS RECORDS (ADMIN ONLY)"""
 @student_namespace.route("/records")
 class GetStudentRecords(Resource):
-    @student_namespace.marshal_with(student_records_model)
+    @student_namespace.expect(page_parser)
+    @fast_marshal_with(student_namespace, student_records_model)
     @student_namespace.doc(description="Retrieve All Students Records (Admin Only)")
     @jwt_required()
     def get(self):
         """Get All Students Records"""
         if current_user.is_admin:
-            students_records = get_all_students_records()
-            return students_records, HTTPStatus.OK
+            students_records = get_all_students_records(get_page())
+            return students_records, HTTPStatus.OK, page_headers(students_records)
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only.")
+
+
+"""EXPORT ALL STUDENTS RECORDS (ADMIN ONLY)"""
+@student_namespace.route("/records/export")
+class ExportStudentsRecords(Resource):
+    @student_namespace.response(HTTPStatus.OK, "All Students Records, Streamed", [student_records_model])
+    @student_namespace.doc(description="Export All Students Records as a Streamed JSON Array (Admin Only)")
+    @admin_required()
+    def get(self):
+        """Admin: Export All Students Records"""
+        students_records = get_all_students_records(yield_per=current_app.config["STREAM_YIELD_PER"])
+        return stream_json_list(students_records, student_records_model)
         
\ No newline at end of file
@@ -2,6 +2,8 @@ from flask_restx import Resource, abort
 from http import HTTPStatus
 from flask_jwt_extended import jwt_required, current_user
 from api.utils.query_func import get_all_teachers
+from api.utils.pagination import get_page, page_headers, page_parser
+from api.utils.serializer import fast_marshal_with
 from ..teacher import teacher_namespace
 from ..teacher.schemas import teacher_model
 
@@ -9,7 +11,8 @@ from ..teacher.schemas import teacher_model
 # GET ALL TEACHERS
 @teacher_namespace.route("/")
 class Teachers(Resource):
-    @teacher_namespace.marshal_with(teacher_model)
+    @teacher_namespace.expect(page_parser)
+    @fast_marshal_with(teacher_namespace, teacher_model)
     @teacher_namespace.doc(description="Retrieve All Teachers")
     @jwt_required()
     def get(self):
@@ -17,6 +20,6 @@ class Teachers(Resource):
         Get All Teachers
         """
         if current_user.is_admin:
-            teachers = get_all_teachers()
-            return teachers, HTTPStatus.OK
+            teachers = get_all_teachers(get_page())
+            return teachers, HTTPStatus.OK, page_headers(teachers)
         abort(HTTPStatus.UNAUTHORIZED, message="Admin Only")
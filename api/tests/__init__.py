@@ -3,18 +3,21 @@ import unittest
 from flask_jwt_extended import create_access_token
 
 from ..utils.calc_func import calc_course_count, calc_total_credits
-from ..models import User, Student, Course, StudentCourseScore, StudentRecord, GradeScale
+from ..models import User, Student, Teacher, Department, Course, StudentCourseScore, StudentRecord, GradeScale
 from .. import create_app
 from ..config.config import config_dict
 from ..utils import db
+from ..utils.view_func import rebuild_student_course_view
 from werkzeug.security import generate_password_hash
 import os
 
 
 class UnitTestCase(unittest.TestCase):
+    config = config_dict["test"]
+
     # called before each test
     def setUp(self):
-        self.app = create_app(config=config_dict["test"])
+        self.app = create_app(config=self.config)
         self.app_ctxt = self.app.app_context()
         self.app_ctxt.push()
         # using a test client
@@ -23,7 +26,7 @@ class UnitTestCase(unittest.TestCase):
 
     # called after each test case
     def tearDown(self):
-        db.drop_all
+        db.drop_all()
         self.app_ctxt.pop()
         self.app = None
         self.client = None
@@ -38,6 +41,41 @@ def get_auth_token_headers(identity):
     return headers
 
 
+"""FUNCTIONS TO CREATE THE RECORDS REFERENCED BY THE OTHERS"""
+def create_test_department():
+    # department 1, created on first use by the fixtures referencing it
+    test_department = db.session.get(Department, 1)
+    if test_department is None:
+        test_department = Department(id=1, name="Department Test", code="DTE")
+        test_department.save_to_db()
+    return test_department
+
+
+def create_test_teachers(count=3):
+    # teachers 1 to `count`, created on first use by the fixtures referencing them
+    create_test_department()
+    test_teachers = []
+    for teacher_id in range(1, count + 1):
+        test_teacher = Teacher.get_by_teacher_id(teacher_id)
+        if test_teacher is None:
+            test_teacher = Teacher(
+                teacher_id=teacher_id,
+                type="teacher",
+                title="MR",
+                first_name=f"Teacher{teacher_id}",
+                last_name="Test",
+                staff_code=f"TCH/{year_str}/{teacher_id:04d}",
+                username=f"teacher{teacher_id}.test",
+                email=f"teacher{teacher_id}@test.com",
+                gender="MALE",
+                password_hash="teacher@password",
+                department_id=1
+            )
+            test_teacher.save_to_db()
+        test_teachers.append(test_teacher)
+    return test_teachers
+
+
 """FUNCTIONS TO CREATE SINGLE RECORD DATA"""
 def create_test_admin():
     test_admin = User(
@@ -55,6 +93,7 @@ def create_test_admin():
 
 
 def create_test_user():
+    create_test_department()
     test_user = User(
         type="student",
         title="MR",
@@ -71,6 +110,7 @@ def create_test_user():
 
 
 def create_test_student():
+    create_test_department()
     test_student = Student(
         type="student",
         title="MR",
@@ -88,6 +128,7 @@ def create_test_student():
 
 
 def create_test_student_record():
+    create_test_department()
     test_student_record = StudentRecord(
         student_id=1,
         matric_no=f"STU/{year_str}/0000",
@@ -125,6 +166,7 @@ def create_test_grade_scale():
 
 
 def create_test_course():
+    create_test_teachers(1)
     test_course = Course(
         name="Course Test",
         code="TCO",
@@ -137,6 +179,7 @@ def create_test_course():
 
 
 def create_test_student_course():
+    create_test_department()
     test_student_course = StudentCourseScore(
         student_id=1,
         matric_no=f"STU/{year_str}/0001",
@@ -146,12 +189,15 @@ def create_test_student_course():
         department_id=1
     )
     test_student_course.save_to_db()
+    # saved directly, so their student course view rows are written here
+    rebuild_student_course_view()
     return test_student_course
 
 
 
 """FUNCTION TO CREATE MULTIPLE RECORD DATA"""
 def create_test_students():
+    create_test_department()
     test_students = []
     
     test_student1 = Student(
@@ -205,6 +251,7 @@ def create_test_students():
 
 
 def create_test_students_records():
+    create_test_department()
     test_students_records = []
     
     test_student_record1 = StudentRecord(
@@ -249,6 +296,7 @@ def create_test_students_records():
 
 
 def create_test_courses():
+    create_test_teachers(3)
     test_courses = []
     
     test_course1 = Course(
@@ -286,6 +334,7 @@ def create_test_courses():
     return test_courses
 
 def create_test_student_courses():
+    create_test_department()
     test_student_courses = []
     
     test_student_course1 = StudentCourseScore(
@@ -323,10 +372,13 @@ def create_test_student_courses():
     test_student_courses.append(test_student_course2)
     test_student_courses.append(test_student_course3)
     
+    # saved directly, so their student course view rows are written here
+    rebuild_student_course_view()
     return test_student_courses
 
 
 def create_test_course_students():
+    create_test_department()
     test_course_students = []
     
     test_course_student1 = StudentCourseScore(
@@ -364,6 +416,8 @@ def create_test_course_students():
     test_course_students.append(test_course_student2)
     test_course_students.append(test_course_student3)
     
+    # saved directly, so their student course view rows are written here
+    rebuild_student_course_view()
     return test_course_students
 
 
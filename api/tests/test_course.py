@@ -1,11 +1,16 @@
-from . import UnitTestCase, create_test_admin, create_test_course, create_test_course_students, create_test_grade_scale, create_test_student_record, create_test_students, create_test_students_records, get_auth_token_headers, year_str
-from ..models import Course, StudentCourseScore
+from . import UnitTestCase, create_test_admin, create_test_teachers, create_test_course, create_test_course_students, create_test_grade_scale, create_test_student_record, create_test_students, create_test_students_records, get_auth_token_headers, year_str
+from ..utils.calc_func import get_score_grade
+from ..models import Course, StudentCourseScore, StudentRecord
+from ..utils.job_func import job_runner
+from ..utils.view_func import refresh_student_course_view
+from ..utils import db
 
 
 class CourseTestCase(UnitTestCase):
     
     def test_create_get_all_course(self):
         test_admin = create_test_admin()
+        test_teachers = create_test_teachers(1)
 
         data = {
             "name": "Test Course",
@@ -36,10 +41,17 @@ class CourseTestCase(UnitTestCase):
         assert response.status_code == 200
         assert len(response.json) == 1
 
+        export_response = self.client.get(
+            "/courses/export", 
+            headers=get_auth_token_headers(test_admin.username))
+        assert export_response.is_streamed
+        assert export_response.json == response.json
+
 
     def test_get_all_course_students(self):
         test_admin = create_test_admin()
         test_course = create_test_course()
+        test_students = create_test_students()
         test_course_students = create_test_course_students()
 
         course_id = test_course.id
@@ -69,12 +81,11 @@ class CourseTestCase(UnitTestCase):
 
         # update route
         update_data = {
-            "student1_id": 1,
-            "score1": 80,
-            "student2_id": 2,
-            "score2": 65,
-            "student3_id": 3,
-            "score3": 75,
+            "scores": [
+                {"id": 1, "score": 80},
+                {"id": 2, "score": 65},
+                {"id": 3, "score": 75},
+            ]
         }
         update_response = self.client.patch(
             f"/courses/grades/{course_id}/students",
@@ -101,5 +112,153 @@ class CourseTestCase(UnitTestCase):
 
         student3_grade = StudentCourseScore.query.filter_by(student_id=3, course_id=course_id).first()
         assert student3_grade.score == 75
+        assert StudentRecord.query.filter_by(student_id=2).first().total_points == 9 # 3 credits * 3 points (Grade B)
+
+        # best scores first, a page at a time
+        page_response = self.client.get(
+            f"/courses/grades/{course_id}/students?limit=2",
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert [student["score"] for student in page_response.json] == [80, 75]
+        page_response = self.client.get(
+            f"/courses/grades/{course_id}/students?limit=2&cursor={page_response.headers['X-Next-Cursor']}",
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert [student["score"] for student in page_response.json] == [65]
+
+        # nothing is graded if any student is not registered for the course
+        invalid_response = self.client.patch(
+            f"/courses/grades/{course_id}/students",
+            json={"scores": [{"id": 1, "score": 65}, {"id": 4, "score": 70}]},
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert invalid_response.status_code == 404
+        assert StudentCourseScore.query.filter_by(student_id=1, course_id=course_id).first().score == 80
+
+        # nothing is graded if any score is outside the grade scale
+        invalid_response = self.client.patch(
+            f"/courses/grades/{course_id}/students",
+            json={"scores": [{"id": 1, "score": 65}, {"id": 2, "score": 150}, {"id": 3, "score": -5}]},
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert invalid_response.status_code == 400
+        assert invalid_response.json["message"] == "No grade covers the scores of IDs [2, 3]"
+
+        # true and false are not IDs or scores, and the body must be an object
+        for invalid_data in ({"scores": [{"id": True, "score": 65}]}, {"scores": [{"id": 1, "score": False}]}, [], "scores"):
+            invalid_response = self.client.patch(
+                f"/courses/grades/{course_id}/students",
+                json=invalid_data,
+                headers=get_auth_token_headers(test_admin.username)
+            )
+            assert invalid_response.status_code == 400
+        assert StudentCourseScore.query.filter_by(student_id=1, course_id=course_id).first().score == 80
         assert student3_grade.grade == "A"
 
+
+    def test_page_graded_and_ungraded_course_students(self):
+        test_admin = create_test_admin()
+        test_course = create_test_course()
+        test_students = create_test_students()
+        test_course_students = create_test_course_students()
+        course_id = test_course.id
+
+        # student 2 is not graded yet
+        StudentCourseScore.query.filter_by(student_id=1).update({"score": 80})
+        StudentCourseScore.query.filter_by(student_id=2).update({"score": None})
+        StudentCourseScore.query.filter_by(student_id=3).update({"score": 0})
+        refresh_student_course_view(StudentCourseScore.course_id, [course_id])
+        db.session.commit()
+
+        headers = get_auth_token_headers(test_admin.username)
+        response = self.client.get(f"/courses/grades/{course_id}/students", headers=headers)
+        assert [(student["student_id"], student["score"]) for student in response.json] == [(1, 80), (3, 0), (2, None)]
+
+        # every student is paged, the ungraded last
+        paged, url = [], f"/courses/grades/{course_id}/students?limit=1"
+        while url:
+            page_response = self.client.get(url, headers=headers)
+            assert page_response.status_code == 200
+            paged += [(student["student_id"], student["score"]) for student in page_response.json]
+            cursor = page_response.headers.get("X-Next-Cursor")
+            url = cursor and f"/courses/grades/{course_id}/students?limit=1&cursor={cursor}"
+        assert paged == [(1, 80), (3, 0), (2, None)]
+
+
+    def test_score_grade_lookup(self):
+        test_grade_scale = create_test_grade_scale()
+
+        assert get_score_grade(100) == ("A", 4)
+        assert get_score_grade(70) == ("A", 4)
+        assert get_score_grade(60) == ("B", 3)
+        # scores outside the grade scale
+        assert get_score_grade(10) == (None, 0)
+        assert get_score_grade(101) == (None, 0)
+
+        # changing the grade scale rebuilds the table
+        test_grade_b = test_grade_scale[1]
+        test_grade_b.min = 50
+        test_grade_b.update_db()
+        assert get_score_grade(55) == ("B", 3)
+
+        # a change rolled back is never kept in the table
+        test_grade_b.min = 40
+        db.session.flush()
+        assert get_score_grade(45) == (None, 0)
+        db.session.rollback()
+        assert get_score_grade(45) == (None, 0)
+        assert get_score_grade(55) == ("B", 3)
+
+
+    def test_upload_course_students_grades(self):
+        test_admin = create_test_admin()
+        test_course = create_test_course()
+        test_grade_scale = create_test_grade_scale()
+        test_students = create_test_students()
+        test_students_records = create_test_students_records()
+        test_course_students = create_test_course_students()
+
+        course_id = test_course.id  # 3 credits
+        headers = get_auth_token_headers(test_admin.username)
+        headers["Content-Type"] = "text/csv"
+
+        csv_data = (
+            "student_id,matric_no,score\n"
+            "1,,80\n"
+            f",STU/{year_str}/0002,65\n"
+            "4,,70\n"
+            f",STU/{year_str}/0003,abc\n"
+        )
+        response = self.client.post(f"/courses/grades/{course_id}/upload", data=csv_data, headers=headers)
+        assert response.status_code == 200
+        assert response.json["status"] == "completed"
+        assert response.json["total_rows"] == 4
+        assert response.json["graded_rows"] == 2
+        assert [error["row"] for error in response.json["errors"]] == [3, 4]
+        # asserting saved data
+        course_student = StudentCourseScore.query.filter_by(student_id=1, course_id=course_id).first()
+        assert course_student.grade == "A"
+        assert course_student.scored_point == 12
+        stu_records = StudentRecord.query.filter_by(student_id=2).first()
+        assert stu_records.course_count == 1
+        assert stu_records.total_points == 9 # 3 credits * 3 points (Grade B)
+        assert stu_records.gpa == 300
+
+        # bodies over MAX_CONTENT_LENGTH are refused before they are read
+        self.app.config["MAX_CONTENT_LENGTH"] = len(csv_data) - 1
+        response = self.client.post(f"/courses/grades/{course_id}/upload", data=csv_data, headers=headers)
+        assert response.status_code == 413
+        self.app.config["MAX_CONTENT_LENGTH"] = len(csv_data)
+
+        # large uploads are graded by a background job
+        self.app.config["GRADE_UPLOAD_BACKGROUND_ROWS"] = 0
+        response = self.client.post(
+            f"/courses/grades/{course_id}/upload", data="student_id,score\n3,75\n", headers=headers
+        )
+        assert response.status_code == 202
+        job_runner.shutdown()
+
+        job_response = self.client.get(response.headers["Location"], headers=headers)
+        assert job_response.status_code == 200
+        assert job_response.json["status"] == "completed"
+        assert job_response.json["graded_rows"] == 1
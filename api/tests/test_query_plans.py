@@ -0,0 +1,89 @@
+import inspect
+from sqlalchemy import event
+from . import UnitTestCase
+from ..models import StudentCourseScore
+from ..utils import db
+from ..utils import calc_func, query_func
+from ..utils.pagination import Page
+from ..utils.request_loader import drop_loader
+
+
+# the arguments each query function is planned with; list functions get a page after a cursor
+QUERY_FUNC_CALLS = {
+    "check_email_exist": ("student@test.com",),
+    "get_all_departments": (Page(limit=10, after=[1]),),
+    "check_department_exist": ("TDE",),
+    "get_all_teachers": (Page(limit=10, after=[1]),),
+    "get_all_courses": (Page(limit=10, after=[1]),),
+    "check_course_code_exist": ("TCO",),
+    "get_course": (1,),
+    "check_course_exist": (1,),
+    "get_courses_by_id_list": ([1, 2],),
+    "get_course_details_by_id": (1,),
+    "get_course_students": (1, Page(limit=10, after=[50, 1])),
+    "get_courses_students_by_id_list": ([1, 2], 1),
+    "get_all_students": (Page(limit=10, after=[1]),),
+    "get_student": (1,),
+    "get_student_details": (1,),
+    "check_student_exist": (1,),
+    "get_student_records": (1,),
+    "get_all_students_records": (Page(limit=10, after=[1]),),
+    "get_student_courses_details": (1, Page(limit=10, after=[1])),
+    "get_student_course_detail_by_id": (1, 1),
+    "get_student_courses_by_id_list": (1, [1, 2]),
+    "check_student_registered_course": (1, 1),
+    "get_student_registered_course_by_id": (1, 1),
+    "get_course_registrations": (1, [1, 2]),
+    "get_student_registrations": (1, [1, 2]),
+}
+
+CALC_FUNC_CALLS = {
+    "calc_course_count": (1,),
+    "calc_total_credits": (1,),
+    "calc_records_aggregates": (StudentCourseScore.student_id == 1,),
+}
+
+
+def get_query_plans(func, *args):
+    """function to call `func` and get the EXPLAIN QUERY PLAN steps of each statement it executed."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    # entities memoized by an earlier call would not be queried again
+    drop_loader()
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        func(*args)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    connection = db.session.connection()
+    return [
+        [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        for statement, parameters in statements
+    ]
+
+
+class QueryPlanTestCase(UnitTestCase):
+
+    def assert_no_table_scan(self, module, calls):
+        for name, args in calls.items():
+            plans = get_query_plans(getattr(module, name), *args)
+            assert plans, name
+            for steps in plans:
+                scans = [step for step in steps if step.startswith("SCAN ")]
+                assert not scans, f"{name} scans a table: {steps}"
+
+    def test_query_func_plans_use_indexes(self):
+        functions = [
+            name for name, member in inspect.getmembers(query_func, inspect.isfunction)
+            if member.__module__ == query_func.__name__ and not name.startswith("_")
+        ]
+        # every query function has to be planned here
+        assert sorted(functions) == sorted(QUERY_FUNC_CALLS)
+        self.assert_no_table_scan(query_func, QUERY_FUNC_CALLS)
+
+    def test_calc_func_plans_use_indexes(self):
+        self.assert_no_table_scan(calc_func, CALC_FUNC_CALLS)
@@ -0,0 +1,105 @@
+import os
+import tempfile
+from unittest.mock import patch
+from sqlalchemy.exc import OperationalError
+from . import UnitTestCase, create_test_admin, create_test_course, get_auth_token_headers
+from ..config.config import config_dict
+from ..models import Course, User
+from ..utils import db
+from ..utils.replica import PRIMARY_COOKIE, replica_router
+
+
+class ReplicaTestCase(UnitTestCase):
+    # the primary is the in-memory database of the tests, the replica a SQLite file
+    def setUp(self):
+        self.replica_dir = tempfile.TemporaryDirectory()
+        replica_uri = "sqlite:///" + os.path.join(self.replica_dir.name, "replica.sqlite3")
+        self.config = type("ReplicaTestingConfig", (config_dict["test"],), {
+            "SQLALCHEMY_BINDS": {"replica": replica_uri},
+            "REPLICA_LAG_CHECK_INTERVAL": 0,
+        })
+        super().setUp()
+
+    def tearDown(self):
+        db.engines["replica"].dispose()
+        super().tearDown()
+        # the extension keeps a metadata per bind key, the next apps have no replica
+        db.metadatas.pop("replica", None)
+        self.replica_dir.cleanup()
+
+    def replicate(self):
+        # copy the whole primary database to the replica file, as the replication would
+        db.session.commit()
+        primary, replica = db.engines[None].raw_connection(), db.engines["replica"].raw_connection()
+        try:
+            primary.driver_connection.backup(replica.driver_connection)
+        finally:
+            primary.close()
+            replica.close()
+
+    def get_course_names(self, client, headers):
+        response = client.get("/courses/", headers=headers)
+        assert response.status_code == 200
+        return sorted(course["course_name"] for course in response.json)
+
+    def test_get_requests_read_from_replica(self):
+        test_admin = create_test_admin()
+        create_test_course()
+        self.replicate()
+        headers = get_auth_token_headers(test_admin.username)
+
+        # a course the replica has not received yet
+        Course(name="Course Primary", code="TCP", credit=2, teacher_id=1, department_id=1).save_to_db()
+        assert self.get_course_names(self.client, headers) == ["Course Test"]
+
+        # writes go to the primary, and the writer reads its own writes
+        response = self.client.post(
+            "/courses/",
+            json={"name": "Course Posted", "code": "TCX", "credit": 3, "teacher_id": 1, "department_id": 1},
+            headers=headers,
+        )
+        assert response.status_code == 201
+        assert PRIMARY_COOKIE in response.headers["Set-Cookie"]
+        assert Course.query.count() == 3
+        assert self.get_course_names(self.client, headers) == ["Course Posted", "Course Primary", "Course Test"]
+        # also when the client drops the cookie, from the token identity
+        assert self.get_course_names(self.app.test_client(), headers) == ["Course Posted", "Course Primary", "Course Test"]
+
+        # other users keep reading the replica
+        User(
+            first_name="Other", last_name="Admin", gender="MALE", email="other.admin@test.com",
+            username="other.admin", password_hash="admin@password", is_staff=True, is_admin=True,
+        ).save_to_db()
+        self.replicate()
+        Course(name="Course Later", code="TCL", credit=2, teacher_id=1, department_id=1).save_to_db()
+        other_headers = get_auth_token_headers("other.admin")
+        assert self.get_course_names(self.app.test_client(), other_headers) == ["Course Posted", "Course Primary", "Course Test"]
+
+        # the user of a token is looked up on the primary, before the token identity is known
+        User(
+            first_name="New", last_name="Admin", gender="MALE", email="new.admin@test.com",
+            username="new.admin", password_hash="admin@password", is_staff=True, is_admin=True,
+        ).save_to_db()
+        new_headers = get_auth_token_headers("new.admin")
+        assert self.get_course_names(self.app.test_client(), new_headers) == ["Course Posted", "Course Primary", "Course Test"]
+
+    def test_stale_replica_falls_back_to_primary(self):
+        test_admin = create_test_admin()
+        create_test_course()
+        self.replicate()
+        headers = get_auth_token_headers(test_admin.username)
+        Course(name="Course Primary", code="TCP", credit=2, teacher_id=1, department_id=1).save_to_db()
+
+        # the lag is measured without holding the lock the other requests wait on
+        def measure_lag(engine):
+            assert not replica_router._lock.locked()
+            return replica_router.max_lag + 1
+
+        with patch.object(replica_router, "measure_lag", side_effect=measure_lag):
+            assert self.get_course_names(self.client, headers) == ["Course Primary", "Course Test"]
+
+        unreachable = OperationalError("SELECT 1", {}, Exception("unable to open database file"))
+        with patch.object(replica_router, "measure_lag", side_effect=unreachable):
+            assert self.get_course_names(self.client, headers) == ["Course Primary", "Course Test"]
+
+        assert self.get_course_names(self.client, headers) == ["Course Test"]
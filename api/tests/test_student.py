@@ -13,7 +13,12 @@ from . import (
     create_test_student, 
     get_auth_token_headers,
 )
-from ..models import StudentCourseScore, Student, StudentRecord
+from sqlalchemy import delete, select
+from ..models import StudentCourseScore, StudentCourseView, Student, StudentRecord
+from ..utils import db
+from ..utils.request_loader import get_loader
+from ..utils.user_cache import user_cache
+from ..utils.view_func import rebuild_student_course_view, student_course_view_source
 from ..utils.calc_func import calc_course_count, calc_total_credits, calc_student_gpa_honours
 
 
@@ -82,6 +87,12 @@ class StudentTestCase(UnitTestCase):
         assert update_stu.first_name == "Stu1"
         assert update_stu.last_name == "Test1"
 
+        # the student's token is in use, so the student is in the user cache
+        student_username = update_stu.username
+        student_headers = get_auth_token_headers(student_username)
+        assert self.client.get("/students/", headers=student_headers).status_code == 200
+        assert user_cache.get(student_username) is not None
+
         # delete route
         delete_response = self.client.delete(
             f"/students/{student_id}",
@@ -91,6 +102,9 @@ class StudentTestCase(UnitTestCase):
         
         delete_stu = Student.get_by_student_id(student_id)
         assert delete_stu == None        
+        # the deleted student's token is refused
+        assert user_cache.get(student_username) is None
+        assert self.client.get("/students/", headers=student_headers).status_code == 401
 
 
     def test_register_unregister_multiple_student_courses(self):
@@ -101,9 +115,11 @@ class StudentTestCase(UnitTestCase):
         student_id = test_student.student_id
 
         reg_data = {
-            "course1": 1, # 2 credits
-            "course2": 2, # 3 credits
-            "course3": 3, # 4 credits
+            "course_ids": [
+                1, # 2 credits
+                2, # 3 credits
+                3, # 4 credits
+            ]
         }
         
         # register route
@@ -118,10 +134,28 @@ class StudentTestCase(UnitTestCase):
         reg_stu_records = StudentRecord.query.filter_by(student_id=student_id).first()
         assert reg_stu_records.course_count == 3
         assert reg_stu_records.total_credits == 9
+
+        # registering again only adds the new courses
+        rereg_response = self.client.post(
+            f"/students/{student_id}/courses",
+            json={"course_ids": [1, 2]},
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert rereg_response.status_code == 201
+        assert rereg_response.json == []
+        assert StudentCourseScore.query.filter_by(student_id=student_id).count() == 3
+
+        # unknown courses are rejected
+        invalid_response = self.client.post(
+            f"/students/{student_id}/courses",
+            json={"course_ids": [1, 99]},
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert invalid_response.status_code == 404
         
         # unregister route
         unreg_data = {
-            "course1": 3, # 4 credits
+            "course_ids": [3], # 4 credits
         }
         
         unreg_response = self.client.delete(
@@ -137,9 +171,188 @@ class StudentTestCase(UnitTestCase):
         assert unreg_stu_records.total_credits == 5
         
 
+    def test_enroll_students_into_courses(self):
+        test_admin = create_test_admin()
+        test_students = create_test_students()
+        test_students_records = create_test_students_records()
+        test_courses = create_test_courses()
+        test_student_course = create_test_student_course()  # student 1 already registered for course 1
+
+        # a whole department, through the endpoint
+        response = self.client.post(
+            "/students/enroll",
+            json={"department_id": 1, "course_ids": [1, 2]},
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert response.status_code == 201
+        assert response.json == {"students": 3, "registered": 5}
+        assert StudentCourseScore.query.count() == 6
+        stu_records = StudentRecord.query.filter_by(student_id=2).first()
+        assert stu_records.course_count == 2
+        assert stu_records.total_credits == 5
+
+        # a list of students, through the CLI
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=["enroll", "--course-id", "3", "--student-id", "2", "--student-id", "3"])
+        assert "2 registrations created for 2 students" in result.output
+        db.session.expire_all()
+        assert StudentRecord.query.filter_by(student_id=3).first().total_credits == 9
+
+        # unknown courses are rejected
+        invalid_response = self.client.post(
+            "/students/enroll",
+            json={"department_id": 1, "course_ids": [99]},
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert invalid_response.status_code == 400
+
+        # unknown students are rejected and listed
+        invalid_response = self.client.post(
+            "/students/enroll",
+            json={"student_ids": [1, 98, 99], "course_ids": [3]},
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert invalid_response.status_code == 400
+        assert invalid_response.json["message"] == "Students not found: [98, 99]"
+
+        # a department and a list of students are not enrolled together
+        invalid_response = self.client.post(
+            "/students/enroll",
+            json={"department_id": 1, "student_ids": [1], "course_ids": [3]},
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert invalid_response.status_code == 400
+        assert StudentCourseScore.query.filter_by(course_id=3).count() == 2
+
+        # true and false are not IDs, and the body must be an object
+        for invalid_data in (
+            {"student_ids": [True], "course_ids": [3]},
+            {"department_id": 1, "course_ids": [True]},
+            {"department_id": True, "course_ids": [3]},
+            [{"department_id": 1, "course_ids": [3]}],
+        ):
+            invalid_response = self.client.post(
+                "/students/enroll", json=invalid_data, headers=get_auth_token_headers(test_admin.username)
+            )
+            assert invalid_response.status_code == 400
+        assert StudentCourseScore.query.filter_by(course_id=3).count() == 2
+
+
+    def test_students_keyset_pagination(self):
+        test_admin = create_test_admin()
+        test_students = create_test_students()
+        headers = get_auth_token_headers(test_admin.username)
+
+        first_response = self.client.get("/students/?limit=2", headers=headers)
+        assert first_response.status_code == 200
+        assert [student["student_id"] for student in first_response.json] == [1, 2]
+        next_cursor = first_response.headers["X-Next-Cursor"]
+        assert f"cursor={next_cursor}" in first_response.headers["Link"]
+
+        last_response = self.client.get(f"/students/?limit=2&cursor={next_cursor}", headers=headers)
+        assert [student["student_id"] for student in last_response.json] == [3]
+        assert "X-Next-Cursor" not in last_response.headers
+
+        # the page size is capped by the server
+        self.app.config["PAGINATION_MAX_LIMIT"] = 1
+        assert len(self.client.get("/students/?limit=100", headers=headers).json) == 1
+
+        invalid_response = self.client.get("/students/?cursor=not-a-cursor", headers=headers)
+        assert invalid_response.status_code == 400
+
+
+    def test_student_course_view_in_sync(self):
+        test_admin = create_test_admin()
+        test_student = create_test_student()
+        test_courses = create_test_courses()
+        test_grade_scale = create_test_grade_scale()
+        test_student_record = create_test_student_record()
+        student_id = test_student.student_id
+        headers = get_auth_token_headers(test_admin.username)
+
+        def assert_view_in_sync(count):
+            view_rows = db.session.execute(select(*StudentCourseView.__table__.c).order_by(StudentCourseView.id)).all()
+            source_rows = db.session.execute(student_course_view_source().order_by(StudentCourseScore.id)).all()
+            assert view_rows == source_rows
+            assert len(view_rows) == count
+
+        self.client.post(f"/students/{student_id}/courses", json={"course_ids": [1, 2, 3]}, headers=headers)
+        assert_view_in_sync(3)
+
+        self.client.patch(f"/students/grades/{student_id}/course/1", json={"score": 75}, headers=headers)
+        self.client.patch(
+            f"/students/grades/{student_id}/courses",
+            json={"scores": [{"id": 2, "score": 65}, {"id": 3, "score": 80}]},
+            headers=headers,
+        )
+        assert_view_in_sync(3)
+        assert StudentCourseView.query.filter_by(course_id=1).first().grade == "A"
+
+        self.client.put(f"/students/{student_id}", json={"first_name": "Renamed"}, headers=headers)
+        assert_view_in_sync(3)
+        assert StudentCourseView.query.filter_by(course_id=1).first().student_name == "Renamed Test"
+
+        self.client.delete(f"/students/{student_id}/courses", json={"course_ids": [2]}, headers=headers)
+        assert_view_in_sync(2)
+
+        # the view is rebuilt from the source tables after any drift
+        db.session.execute(delete(StudentCourseView).where(StudentCourseView.course_id == 1))
+        db.session.commit()
+        assert rebuild_student_course_view() == 2
+        assert_view_in_sync(2)
+
+        # the student record goes with the student
+        assert self.client.delete(f"/students/{student_id}", headers=headers).status_code == 200
+        assert StudentRecord.query.filter_by(student_id=student_id).count() == 0
+        assert_view_in_sync(0)
+
+
+    def test_request_loader_memoizes_lookups(self):
+        test_students = create_test_students()
+        statements = []
+
+        def count_select(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("SELECT"):
+                statements.append(statement)
+
+        with self.app.test_request_context():
+            db.event.listen(db.engine, "before_cursor_execute", count_select)
+            loader = get_loader()
+            # fetched once, including a lookup that found nothing
+            assert loader.get(Student.student_id, 1).student_id == 1
+            assert loader.get(Student.student_id, 1) is get_loader().get(Student.student_id, 1)
+            assert loader.get(Student.student_id, 99) is None
+            assert loader.get(Student.student_id, 99) is None
+            assert len(statements) == 2
+            # only the students not looked up yet are loaded, with one query
+            students = loader.get_many(Student.student_id, [1, 2, 3, 99])
+            assert [student.student_id if student else None for student in students.values()] == [1, 2, 3, None]
+            assert len(statements) == 3
+            db.event.remove(db.engine, "before_cursor_execute", count_select)
+
+        # each request gets its own loader
+        with self.app.test_request_context():
+            assert get_loader() is not loader
+
+
+    def test_export_students_records(self):
+        test_admin = create_test_admin()
+        test_students = create_test_students()
+        test_students_records = create_test_students_records()
+
+        response = self.client.get("/students/records/export", headers=get_auth_token_headers(test_admin.username))
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert [record["student_id"] for record in response.json] == [1, 2, 3]
+        assert set(response.json[0]) == set(self.client.get(
+            "/students/records", headers=get_auth_token_headers(test_admin.username)
+        ).json[0])
+
+
     def test_get_student_registered_courses(self):
         test_admin = create_test_admin()
         test_student = create_test_student()
+        test_courses = create_test_courses()
         test_student_courses = create_test_student_courses()
         student_id = test_student.student_id
 
@@ -152,6 +365,20 @@ class StudentTestCase(UnitTestCase):
         # asserting saved data
         adm_count = StudentCourseScore.query.filter_by(student_id=student_id).count()
         assert adm_count == 3
+        assert [course["course_id"] for course in adm_response.json] == [1, 2, 3]
+
+        # a page at a time, in Course ID order
+        page_response = self.client.get(
+            f"/students/courses/{student_id}?limit=2",
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert [course["course_id"] for course in page_response.json] == [1, 2]
+        page_response = self.client.get(
+            f"/students/courses/{student_id}?limit=2&cursor={page_response.headers['X-Next-Cursor']}",
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert [course["course_id"] for course in page_response.json] == [3]
+        assert "X-Next-Cursor" not in page_response.headers
 
         # test_student get route
         stu_response = self.client.get(
@@ -200,6 +427,15 @@ class StudentTestCase(UnitTestCase):
         assert stu_records.gpa/100 == 4
         assert stu_records.honours == "First Class Honours"
 
+        # a score outside the grade scale is refused
+        invalid_response = self.client.patch(
+            f"/students/grades/{student_id}/course/{course_id}",
+            json={"score": 150},
+            headers=get_auth_token_headers(test_admin.username)
+        )
+        assert invalid_response.status_code == 400
+        assert StudentCourseScore.query.filter_by(student_id=student_id, course_id=course_id).first().score == 80
+
 
     def test_get_update_courses_grades_for_student(self):
         test_admin = create_test_admin()
@@ -217,12 +453,11 @@ class StudentTestCase(UnitTestCase):
 
         # update route
         update_data = {
-            "course1_id": 1,
-            "score1": 80,
-            "course2_id": 2,
-            "score2": 65,
-            "course3_id": 3,
-            "score3": 75,
+            "scores": [
+                {"id": 1, "score": 80},
+                {"id": 2, "score": 65},
+                {"id": 3, "score": 75},
+            ]
         }
         update_response = self.client.patch(
             f"/students/grades/{student_id}/courses",
@@ -250,6 +485,11 @@ class StudentTestCase(UnitTestCase):
         assert course3_grade.score == 75
         assert course3_grade.grade == "A"
 
+        stu_records = StudentRecord.query.filter_by(student_id=student_id).first()
+        assert stu_records.total_points == 33 # 2*4 + 3*3 + 4*4
+        assert stu_records.gpa == 366 # 33 points / 9 credits * 100
+        assert stu_records.honours == "First Class Honours"
+
 
     def test_get_current_or_specific_students_courses_grades(self):
         test_admin = create_test_admin()
@@ -280,6 +520,54 @@ class StudentTestCase(UnitTestCase):
         assert stu_response.status_code == 200
         
 
+    def test_check_repair_students_records(self):
+        test_student = create_test_student()
+        test_student_record = create_test_student_record()
+        test_courses = create_test_courses()
+        test_student_courses = create_test_student_courses()
+        student_id = test_student.student_id
+
+        runner = self.app.test_cli_runner()
+        check_result = runner.invoke(args=["records", "check"])
+        assert "1 mismatched records found." in check_result.output
+        assert "total_credits: 0 != 9" in check_result.output
+        assert StudentRecord.query.filter_by(student_id=student_id).first().course_count != 3
+
+        repair_result = runner.invoke(args=["records", "check", "--repair"])
+        assert "1 mismatched records repaired." in repair_result.output
+        stu_records = StudentRecord.query.filter_by(student_id=student_id).first()
+        assert stu_records.course_count == 3
+        assert stu_records.total_credits == 9
+
+        recheck_result = runner.invoke(args=["records", "check"])
+        assert "0 mismatched records found." in recheck_result.output
+
+
+    def test_rebuild_students_records(self):
+        test_student = create_test_student()
+        test_student_record = create_test_student_record()
+        test_grade_scale = create_test_grade_scale()
+        test_courses = create_test_courses()
+        test_student_courses = create_test_student_courses()
+        student_id = test_student.student_id
+
+        # scores set without grading them, as after a grade scale change
+        StudentCourseScore.query.filter_by(student_id=student_id).update(dict(score=80, grade="F"))
+        db.session.commit()
+
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=["records", "rebuild", "--regrade", "--chunk-size", "1", "--workers", "2"])
+        assert "1 students records rebuilt in 1 chunks" in result.output
+        db.session.expire_all()
+        assert {course.grade for course in StudentCourseScore.query.filter_by(student_id=student_id)} == {"A"}
+        stu_records = StudentRecord.query.filter_by(student_id=student_id).first()
+        assert stu_records.course_count == 3
+        assert stu_records.total_credits == 9
+        assert stu_records.total_points == 36 # 9 credits * 4 points (Grade A)
+        assert stu_records.gpa == 400
+        assert stu_records.honours == "First Class Honours"
+
+
     def test_get_student_records(self):
         test_admin = create_test_admin()        
         test_student = create_test_student()
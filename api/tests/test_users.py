@@ -1,8 +1,23 @@
-from . import UnitTestCase, create_test_admin, create_test_user, create_test_student, get_auth_token_headers, year_str
-from ..models import Student, User, Teacher
+from . import UnitTestCase, create_test_admin, create_test_department, create_test_user, create_test_student, get_auth_token_headers, year_str
+from ..models import Student, User, Teacher, StudentRecord, TokenBlocklist, CodeSequence
+from ..blocklist import BLOCKLIST
+from ..utils.password_func import HashingPoolSaturated, hashing_pool
+from ..utils.sequence_func import code_allocator
+from ..utils import db
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import StaticPool
+from ..utils.db_pool import InstrumentedQueuePool, apply_sqlite_pragmas, pool_stats
+from ..config.config import DevelopmentConfig, engine_options
+from ..utils.user_cache import user_cache
+from ..utils.auth_func import ClaimsUser, get_user_claims
+from werkzeug.exceptions import HTTPException
 from werkzeug.security import generate_password_hash
 from dotenv import load_dotenv
 import os
+import tempfile
+from datetime import datetime, timedelta
+from time import sleep, time
 
 load_dotenv()
 
@@ -11,6 +26,7 @@ class UserTestCase(UnitTestCase):
     # testing the sign-up route
     def test_user_registration(self):
         test_admin=create_test_admin()
+        test_department = create_test_department()
 
         # Student Test Data & Response
         stu_data = {
@@ -101,3 +117,299 @@ class UserTestCase(UnitTestCase):
         )
 
         assert response.status_code == 200
+
+
+    # testing the cached user lookup for authenticated requests
+    def test_user_lookup_cache(self):
+        test_admin = create_test_admin()
+        headers = get_auth_token_headers(test_admin.username)
+
+        self.client.get("/departments/", headers=headers)
+        self.client.get("/departments/", headers=headers)
+        stats = user_cache.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+
+        # updating the user drops it from the cache
+        test_admin.first_name = "Updated"
+        test_admin.update_db()
+        assert user_cache.stats()["size"] == 0
+
+        response = self.client.get("/admin/stats", headers=headers)
+        assert response.status_code == 200
+        assert response.json["user_cache"]["misses"] == 2
+
+
+    # testing the connection pool stats and the pool checkout timeouts
+    def test_db_pool_stats(self):
+        test_admin = create_test_admin()
+
+        response = self.client.get("/admin/stats", headers=get_auth_token_headers(test_admin.username))
+        assert response.status_code == 200
+        assert response.json["db_pools"] == {"primary": {"pool": "StaticPool"}}
+
+        engine = create_engine("sqlite://", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.01)
+        with engine.connect():
+            with self.assertRaises(PoolTimeoutError):
+                engine.connect()
+            stats = pool_stats({None: engine})["primary"]
+        assert stats["checkouts"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["saturation"] == 1.0
+        assert stats["peak_checked_out"] == 1
+        assert engine.pool.stats()["checked_out"] == 0
+        engine.dispose()
+
+
+    # testing the SQLite pragmas of the test database and of a development database file
+    def test_sqlite_pragmas(self):
+        with db.engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+            assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == -65536
+            assert connection.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+        assert isinstance(db.engine.pool, StaticPool)
+
+        with tempfile.TemporaryDirectory() as db_dir:
+            uri = "sqlite:///" + os.path.join(db_dir, "dev.sqlite3")
+            engine = create_engine(uri, **engine_options(uri))
+            apply_sqlite_pragmas(engine, DevelopmentConfig.SQLITE_PRAGMAS)
+            with engine.connect() as connection:
+                assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+                assert connection.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+            engine.dispose()
+
+
+    # testing the user logout and the blocked token
+    def test_user_logout(self):
+        test_user = create_test_user()
+        headers = get_auth_token_headers(test_user.username)
+
+        response = self.client.post("/auth/logout", headers=headers)
+        assert response.status_code == 200
+        assert TokenBlocklist.query.count() == 1
+
+        # the logged out token is rejected
+        response = self.client.post("/auth/logout", headers=headers)
+        assert response.status_code == 401
+
+        # a worker that has not seen the token picks it up from the shared table
+        BLOCKLIST._reset()
+        response = self.client.get("/students/", headers=headers)
+        assert response.status_code == 401
+
+
+    # testing that tokens blocked by other workers are picked up whatever order their rows are committed in
+    def test_blocklist_sync_out_of_order_commits(self):
+        expires_at = datetime.utcnow() + timedelta(hours=1)
+        BLOCKLIST.configure(capacity=1000, error_rate=0.01, sync_interval=0, purge_interval=3600)
+
+        # a higher id is committed, and seen, before a lower one
+        TokenBlocklist(id=5, jti="jti-committed-first", expires_at=expires_at).save_to_db()
+        assert "jti-committed-first" in BLOCKLIST
+        TokenBlocklist(id=3, jti="jti-committed-late", expires_at=expires_at).save_to_db()
+        assert "jti-committed-late" in BLOCKLIST
+        assert "jti-never-blocked" not in BLOCKLIST
+
+        # while another thread builds the first filter, the table is asked instead of the empty filter
+        BLOCKLIST.configure(capacity=1000, error_rate=0.01, sync_interval=0, purge_interval=3600)
+        BLOCKLIST._added_during_sync = []
+        assert "jti-committed-late" in BLOCKLIST
+        assert "jti-never-blocked" not in BLOCKLIST
+        BLOCKLIST._added_during_sync = None
+
+        # checking a token never commits the pending work of the request
+        BLOCKLIST._purged_at -= 3600
+        db.session.add(TokenBlocklist(jti="jti-pending", expires_at=expires_at))
+        assert "jti-committed-first" in BLOCKLIST
+        db.session.rollback()
+        assert TokenBlocklist.query.filter_by(jti="jti-pending").count() == 0
+
+        # expired tokens are purged by the next token blocked
+        TokenBlocklist(jti="jti-expired", expires_at=datetime.utcnow() - timedelta(minutes=1)).save_to_db()
+        BLOCKLIST.add("jti-logout", int(time()) + 3600)
+        assert TokenBlocklist.query.filter_by(jti="jti-expired").count() == 0
+        assert "jti-logout" in BLOCKLIST
+
+
+    # testing the stateless authorization mode using the token claims
+    def test_stateless_auth_claims(self):
+        self.app.config["JWT_STATELESS_AUTH"] = True
+        test_admin = create_test_admin()
+        test_student = create_test_student()
+
+        data = {
+            "email": "student@test.com",
+            "password": os.environ["DEFAULT_STUDENT_PASSWORD"]
+        }
+        login_response = self.client.post("/auth/login", json=data)
+        assert login_response.status_code == 201
+        headers = {"Authorization": f"Bearer {login_response.json['access_token']}"}
+
+        # the student is authorized from the claims, without looking up the user
+        response = self.client.get("/students/", headers=headers)
+        assert response.status_code == 200
+        assert response.json["student_id"] == test_student.student_id
+        assert user_cache.stats()["misses"] == 0
+
+        # admin only routes are refused from the claims
+        response = self.client.get("/admin/stats", headers=headers)
+        assert response.status_code == 401
+
+
+    # testing the claims user of a user deleted after the token was issued
+    def test_stateless_auth_deleted_user(self):
+        test_student = create_test_student()
+        username, claims = test_student.username, get_user_claims(test_student)
+        assert ClaimsUser(username, claims).email == "student@test.com"
+
+        test_student.delete_from_db()
+        claims_user = ClaimsUser(username, claims)
+        assert claims_user.is_admin is False
+        with self.assertRaises(HTTPException) as raised:
+            claims_user.email
+        assert raised.exception.code == 401
+
+
+    # testing the default password flag and the rehash on login
+    def test_user_login_flags_and_rehash(self):
+        test_user = create_test_user()
+        test_user.must_change_password = True
+        test_user.password_hash = generate_password_hash("password123", method="pbkdf2:sha256:1000")
+        test_user.update_db()
+
+        data = {"email": "student@test.com", "password": "password123"}
+        response = self.client.post("/auth/login", json=data)
+
+        assert response.status_code == 201
+        assert response.json["message"] == "Login Successful! Please Change the Default Password!"
+        # the outdated hash is upgraded to the configured parameters
+        user = User.query.filter_by(email="student@test.com").first()
+        assert user.password_hash.startswith(self.app.config["PASSWORD_HASH_METHOD"] + "$")
+
+
+    # testing the password hashing pool and its backpressure
+    def test_hashing_pool(self):
+        test_user = create_test_user()
+        data = {
+            "email": "student@test.com",
+            "password": os.environ["DEFAULT_STUDENT_PASSWORD"]
+        }
+
+        # hashing in a worker process
+        hashing_pool.configure(workers=1, queue_size=4, timeout=30, retry_after=1)
+        response = self.client.post("/auth/login", json=data)
+        assert response.status_code == 201
+
+        # a saturated pool refuses with a retry hint
+        hashing_pool.configure(workers=0, queue_size=0, timeout=30, retry_after=3)
+        response = self.client.post("/auth/login", json=data)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
+
+        # a hash outlasting the timeout is a 503, and keeps its slot until it finishes
+        hashing_pool.configure(workers=1, queue_size=1, timeout=0.05, retry_after=2)
+        with self.assertRaises(HashingPoolSaturated) as raised:
+            hashing_pool.submit(sleep, 0.5)
+        assert raised.exception.retry_after == 2
+        with self.assertRaises(HashingPoolSaturated):
+            hashing_pool.submit(sleep, 0)
+        sleep(1)
+        assert hashing_pool.submit(sleep, 0) is None
+        hashing_pool.configure(workers=0, queue_size=16, timeout=30, retry_after=1)
+
+
+    # testing the bulk registration from JSON and CSV
+    def test_user_bulk_registration(self):
+        test_admin = create_test_admin()
+        test_department = create_test_department()
+        headers = get_auth_token_headers(test_admin.username)
+
+        json_data = [
+            {"user_type": "STUDENT", "title": "MR", "first_name": "Student1", "last_name": "Test",
+             "gender": "MALE", "email": "student1@test.com", "department_id": 1},
+            {"user_type": "TEACHER", "title": "DR", "first_name": "Teacher1", "last_name": "Test",
+             "gender": "FEMALE", "email": "teacher1@test.com", "department_id": 1},
+            {"user_type": "STUDENT", "first_name": "Student2", "last_name": "Test",
+             "gender": "MALE", "email": "student1@test.com", "department_id": 1},
+            {"user_type": "PARENT", "first_name": "Parent", "last_name": "Test",
+             "gender": "MALE", "email": "parent@test.com", "department_id": 1},
+        ]
+        response = self.client.post("/auth/register/bulk", json=json_data, headers=headers)
+
+        assert response.status_code == 201
+        assert response.json["created"] == 2
+        assert response.json["failed"] == 2
+        assert [row["status"] for row in response.json["results"]] == ["created", "created", "failed", "failed"]
+
+        student = Student.query.filter_by(email="student1@test.com").first()
+        assert student.username == "student1.test2"
+        assert student.matric_no == f"STU/{year_str}/0001"
+        assert student.must_change_password
+        assert StudentRecord.query.filter_by(student_id=student.student_id).count() == 1
+        teacher = Teacher.query.filter_by(email="teacher1@test.com").first()
+        assert teacher.staff_code == f"TCH/{year_str}/0001"
+
+        csv_data = (
+            "user_type,title,first_name,last_name,gender,email,department_id\n"
+            "student,MS,Student3,Test,FEMALE,student3@test.com,1\n"
+            "student,,Student4,Test,MALE,student4@test.com,1\n"
+        )
+        response = self.client.post(
+            "/auth/register/bulk", data=csv_data, content_type="text/csv", headers=headers
+        )
+        assert response.status_code == 201
+        assert response.json["created"] == 2
+        assert Student.query.count() == 3
+
+        # a row with an unknown department fails alone, the rest of its chunk is registered
+        json_data = [
+            {"user_type": "STUDENT", "first_name": "Student5", "last_name": "Test",
+             "gender": "MALE", "email": "student5@test.com", "department_id": 1},
+            {"user_type": "STUDENT", "first_name": "Student6", "last_name": "Test",
+             "gender": "MALE", "email": "student6@test.com", "department_id": 99},
+            {"user_type": "TEACHER", "first_name": "Teacher2", "last_name": "Test",
+             "gender": "FEMALE", "email": "teacher2@test.com", "department_id": 1},
+        ]
+        response = self.client.post("/auth/register/bulk", json=json_data, headers=headers)
+        assert response.status_code == 201
+        assert response.json["created"] == 2
+        assert [row["status"] for row in response.json["results"]] == ["created", "failed", "created"]
+        assert response.json["results"][1]["message"] == "Department does not exist"
+        assert Student.query.count() == 4
+        assert Teacher.query.filter_by(email="teacher2@test.com").count() == 1
+
+
+    # testing the block-reserved allocation of usernames and codes
+    def test_code_allocator(self):
+        test_admin = create_test_admin()
+        test_department = create_test_department()
+        code_allocator.configure(block_size=2)
+
+        statements = []
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, "before_cursor_execute", record_statement)
+
+        stu_data = {
+            "user_type": "STUDENT",
+            "title": "MR",
+            "first_name": "Student",
+            "last_name": "Test",
+            "email": "student@test.com",
+            "gender": "MALE",
+            "department_id": 1
+        }
+        response = self.client.post(
+            "/auth/register", json=stu_data, headers=get_auth_token_headers(test_admin.username)
+        )
+        event.remove(db.engine, "before_cursor_execute", record_statement)
+        assert response.status_code == 201
+        assert response.json["username"] == "student.test2"
+        assert response.json["matric_no"] == f"STU/{year_str}/0001"
+        # the user is inserted with its final username and matric number
+        updates = [statement for statement in statements if statement.startswith("UPDATE")]
+        assert all("code_sequences" in statement for statement in updates)
+
+        # numbers are served from the reserved blocks, then a new block is reserved
+        assert code_allocator.take("username", 3) == [3, 4, 5]
+        assert CodeSequence.query.filter_by(name="username").first().next_value == 6
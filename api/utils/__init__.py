@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
+from .replica import RoutingSession
 
 
 naming_convention = {
@@ -11,4 +12,4 @@ naming_convention = {
 }
 
 metadata = MetaData(naming_convention=naming_convention)
-db = SQLAlchemy(metadata=metadata)
+db = SQLAlchemy(metadata=metadata, session_options={"class_": RoutingSession})
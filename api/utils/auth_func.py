@@ -0,0 +1,77 @@
+from functools import wraps
+from http import HTTPStatus
+from flask_restx import abort
+from flask_jwt_extended import current_user, verify_jwt_in_request
+from .user_cache import lookup_user
+
+
+# claims added to the tokens in stateless authorization mode (JWT_STATELESS_AUTH)
+USER_CLAIMS = ("is_admin", "type", "student_id", "teacher_id", "department_id")
+
+
+def get_user_claims(user) -> dict:
+    """function to build the authorization claims embedded in the tokens of a user."""
+    return {
+        "is_admin": bool(user.is_admin),
+        "type": user.type,
+        "student_id": getattr(user, "student_id", None),
+        "teacher_id": getattr(user, "teacher_id", None),
+        "department_id": user.department_id,
+    }
+
+
+def get_token_claims(jwt_data) -> dict:
+    """function to copy the authorization claims out of a decoded token, e.g. when refreshing."""
+    return {name: jwt_data[name] for name in USER_CLAIMS if name in jwt_data}
+
+
+def has_user_claims(jwt_data) -> bool:
+    return all(name in jwt_data for name in USER_CLAIMS)
+
+
+class ClaimsUser:
+    """
+    Current user resolved from the token claims alone.
+
+    The username and the authorization claims are read from the token; any other attribute
+    loads the full user from the database (through the user cache) on first access.
+    """
+
+    def __init__(self, username, jwt_data):
+        self.username = username
+        for name in USER_CLAIMS:
+            setattr(self, name, jwt_data[name])
+        self._user = None
+
+    def __repr__(self):
+        return f"<Claims User: {self.username}>"
+
+    def __getattr__(self, name):
+        # only called for attributes that are not carried in the claims
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.get_user(), name)
+
+    def get_user(self):
+        """function to load the full user, refusing with a 401 when it was deleted or renamed since the token was issued."""
+        if self._user is None:
+            self._user = lookup_user(self.username)
+            if self._user is None:
+                abort(HTTPStatus.UNAUTHORIZED, message="User not found")
+        return self._user
+
+
+def admin_required():
+    """
+    decorator that verifies the JWT in the request and only lets admins through.
+    In stateless authorization mode it decides from the token claims without loading the user.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            verify_jwt_in_request()
+            if current_user.is_admin:
+                return fn(*args, **kwargs)
+            abort(HTTPStatus.UNAUTHORIZED, message="Admin Only")
+        return decorator
+    return wrapper
@@ -1,32 +1,92 @@
-from sqlalchemy import func
+from threading import Lock
+from time import monotonic
+from sqlalchemy import case, event, func, null, select, update
+from sqlalchemy.orm import object_session
 from . import db
+from .view_func import refresh_student_course_view
 from ..models import StudentCourseScore, StudentRecord, GradeScale
 
 
 """STUDENT COURSE SCORE CALC FUNCTIONS"""
 
-def get_score_grade(student_id, course_id, score):
-    grade_point = (
-        db.session.query(GradeScale.grade, GradeScale.point)
-        .filter(GradeScale.min <= score, GradeScale.max >= score)
-        .filter(
-            StudentCourseScore.student_id == student_id,
-            StudentCourseScore.course_id == course_id,
-        )
-    ).first()
-    return grade_point.grade, grade_point.point
+class GradeTable:
+    """
+    The grade scale compiled into a dense table of (grade, point) indexed by score.
 
+    The table is built on first use in each process, and rebuilt after a transaction that
+    inserted, updated or deleted GradeScale rows through the ORM commits or rolls back, so it is
+    never kept from rows that were not committed; changes made by other processes are picked
+    up after `ttl` seconds.
+    """
 
-def calc_scored_point(student_id, course_id):
-    scored_point = (
-        db.session.query(StudentCourseScore.credit * StudentCourseScore.grade_point)
-        .filter(
-            StudentCourseScore.student_id == student_id,
-            StudentCourseScore.course_id == course_id,
-        )
-        .scalar()
-    )
-    return scored_point
+    def __init__(self, ttl=60):
+        self._lock = Lock()
+        self.configure(ttl)
+
+    def configure(self, ttl) -> None:
+        """function to drop the compiled table, called once per app."""
+        self.ttl = ttl
+        self.invalidate()
+
+    def invalidate(self, *args) -> None:
+        self._table = None
+
+    def lookup(self, score):
+        """
+        function to get the grade and grade point of a score.
+
+        :param score: the score, from 0 to the highest max of the grade scale
+        :type score: int
+        :return: the grade and the grade point, (None, 0) if no grade covers the score
+        :rtype: tuple
+        """
+        table = self._table
+        if table is None or monotonic() - self._built_at >= self.ttl:
+            table = self._build()
+        score = int(score)
+        if 0 <= score < len(table) and table[score] is not None:
+            return table[score]
+        return None, 0
+
+    def _build(self) -> list:
+        with self._lock:
+            grades = (
+                db.session.query(GradeScale.grade, GradeScale.point, GradeScale.min, GradeScale.max)
+                .order_by(GradeScale.id)
+                .all()
+            )
+            table = [None] * (max((grade.max for grade in grades), default=-1) + 1)
+            for grade in grades:
+                for score in range(max(grade.min, 0), grade.max + 1):
+                    if table[score] is None:
+                        table[score] = (grade.grade, grade.point)
+            self._table, self._built_at = table, monotonic()
+            return table
+
+
+grade_table = GradeTable()
+
+
+def _mark_grade_scale_changed(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info["grade_scale_changed"] = True
+
+
+def _invalidate_changed_grade_table(session, *args) -> None:
+    if session.info.pop("grade_scale_changed", False):
+        grade_table.invalidate()
+
+
+for identifier in ("after_insert", "after_update", "after_delete"):
+    event.listen(GradeScale, identifier, _mark_grade_scale_changed)
+for identifier in ("after_commit", "after_rollback"):
+    event.listen(db.session, identifier, _invalidate_changed_grade_table)
+
+
+def get_score_grade(score):
+    """function to get the grade and grade point of a score from the compiled grade scale."""
+    return grade_table.lookup(score)
 
 
 """STUDENT RECORDS CALC FUNCTIONS"""
@@ -49,15 +109,6 @@ def calc_total_credits(student_id):
     return total_credits
 
 
-def calc_total_points(student_id):
-    total_points = (
-        db.session.query(func.sum(StudentCourseScore.scored_point))
-        .filter(StudentCourseScore.student_id == student_id)
-        .scalar()
-    )
-    return total_points
-
-
 def calc_student_gpa_honours(student_id):
     # multiplied the gpa value by 100 before storing it in the database.
     # divide by 100 when retrieving it from the database.
@@ -66,21 +117,331 @@ def calc_student_gpa_honours(student_id):
         .filter(StudentRecord.student_id == student_id)
         .scalar()
     )
+    gpa = int(gpa) if gpa else 0
+    return gpa, calc_honours(gpa)
+
+
+# lowest GPA (multiplied by 100) for each class of honours, best first
+HONOURS = (
+    (350, "First Class Honours"),
+    (300, "Second Class Honours (Upper Division)"),
+    (200, "Second Class Honours (Lower Division)"),
+    (100, "Third Class Honours"),
+)
+NO_HONOURS = "No Honours/Degree"
+
+
+def calc_gpa(total_points, total_credits) -> int:
+    """function to calculate the GPA multiplied by 100, as stored in students_records."""
+    return (total_points or 0) * 100 // total_credits if total_credits else 0
+
+
+def calc_honours(gpa):
+    """function to get the honours for a GPA multiplied by 100, None when there is no GPA yet."""
+    if not gpa:
+        return None
+    for min_gpa, honours in HONOURS:
+        if gpa >= min_gpa:
+            return honours
+    return NO_HONOURS
+
+
+def gpa_expr(total_points, total_credits):
+    """SQL expression of calc_gpa, for set-based updates of students_records."""
+    return case(
+        (total_credits > 0, (func.coalesce(total_points, 0) * 100) // total_credits), else_=0
+    )
+
+
+def honours_expr(gpa):
+    """SQL expression of calc_honours, for set-based updates of students_records."""
+    return case(
+        (gpa == 0, null()),
+        *[(gpa >= min_gpa, honours) for min_gpa, honours in HONOURS],
+        else_=NO_HONOURS,
+    )
+
+
+def apply_record_delta(student_id, course_count=0, credits=0, points=0) -> None:
+    """
+    function to apply a change of registrations or scores to a student record, without recomputing it.
+    The update joins the current transaction, commit it together with the write that caused it.
+
+    :param student_id: Student ID
+    :param course_count: courses registered (+) or unregistered (-)
+    :param credits: credits registered (+) or unregistered (-)
+    :param points: change of the scored points
+    :type student_id: int
+    :type course_count: int
+    :type credits: int
+    :type points: int
+    """
+    total_credits = StudentRecord.total_credits + credits
+    total_points = func.coalesce(StudentRecord.total_points, 0) + points
+    gpa = gpa_expr(total_points, total_credits)
+    db.session.execute(
+        update(StudentRecord)
+        .where(StudentRecord.student_id == student_id)
+        .values(
+            course_count=func.coalesce(StudentRecord.course_count, 0) + course_count,
+            total_credits=total_credits,
+            total_points=total_points,
+            gpa=gpa,
+            honours=honours_expr(gpa),
+        )
+        .execution_options(synchronize_session=False)
+    )
 
-    honours = None
-    
-    if gpa:
-        if gpa/100 >= 3.5:
-            honours = "First Class Honours"
-        elif gpa/100 >=3.0 and gpa/100 <=3.49:
-            honours = "Second Class Honours (Upper Division)"
-        elif gpa/100 >=2.0 and gpa/100 <=2.99:
-            honours = "Second Class Honours (Lower Division)"
-        elif gpa/100 >=1.0 and gpa/100 <=1.99:
-            honours = "Third Class Honours"
-        else:
-            honours = "No Honours/Degree"
-    else:
-        gpa = 0
-        
-    return int(gpa), honours
+
+def set_course_score(student_course, score) -> None:
+    """
+    function to grade a registered course from its score, apply the change of scored points
+    to the student record and refresh its student course view row, without committing.
+    """
+    old_scored_point = student_course.scored_point or 0
+    student_course.score = score
+    student_course.grade, student_course.grade_point = get_score_grade(score)
+    student_course.scored_point = student_course.credit * student_course.grade_point
+    apply_record_delta(student_course.student_id, points=student_course.scored_point - old_scored_point)
+    refresh_student_course_view(StudentCourseScore.id, [student_course.id])
+
+
+def is_integer(value) -> bool:
+    """function to tell whether a JSON value is an integer, true and false not counting as one."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def clean_id_scores(items) -> dict:
+    """
+    function to validate a list of {id, score} objects of any length,
+    every score being covered by a grade of the grade scale.
+
+    :raises ValueError: with the reason the list cannot be graded
+    :return: the scores by ID
+    :rtype: dict
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError("Send a non-empty list of {id, score} objects")
+    scores = {}
+    for item in items:
+        if not isinstance(item, dict) or not is_integer(item.get("id")) or not is_integer(item.get("score")):
+            raise ValueError("Each item must have an integer id and an integer score")
+        if item["id"] in scores:
+            raise ValueError(f"ID {item['id']} is repeated")
+        scores[item["id"]] = item["score"]
+    ungraded = [id for id, score in scores.items() if get_score_grade(score)[0] is None]
+    if ungraded:
+        raise ValueError(f"No grade covers the scores of IDs {sorted(ungraded)}")
+    return scores
+
+
+def write_course_scores(course_scores, modified_by) -> int:
+    """
+    function to grade many registered courses with one executemany UPDATE, then refresh their
+    student course view rows, recompute the records of their students and commit, all in one transaction.
+
+    :param course_scores: (registration, score) pairs, the registrations having id, student_id and credit
+    :param modified_by: username of the user grading the courses
+    :return: the number of courses graded
+    :rtype: int
+    """
+    values = []
+    student_ids = set()
+    for registration, score in course_scores:
+        grade, grade_point = get_score_grade(score)
+        values.append(
+            dict(
+                id=registration.id,
+                score=score,
+                grade=grade,
+                grade_point=grade_point,
+                scored_point=registration.credit * grade_point,
+                modified_by=modified_by,
+            )
+        )
+        student_ids.add(registration.student_id)
+    if values:
+        db.session.execute(update(StudentCourseScore), values)
+        refresh_student_course_view(StudentCourseScore.id, [value["id"] for value in values])
+        rebuild_students_records(sorted(student_ids))
+    return len(values)
+
+
+def calc_records_aggregates(*criteria) -> dict:
+    """
+    function to recompute course count, total credits and total points per student
+    from student_courses_scores with one grouped query.
+
+    :param criteria: filters on StudentCourseScore selecting the students, all students if none
+    :return: the aggregates by student ID, students without courses are left out
+    :rtype: dict
+    """
+    aggregates = (
+        db.session.query(
+            StudentCourseScore.student_id,
+            func.count(StudentCourseScore.id).label("course_count"),
+            func.coalesce(func.sum(StudentCourseScore.credit), 0).label("total_credits"),
+            func.coalesce(func.sum(StudentCourseScore.scored_point), 0).label("total_points"),
+        )
+        .filter(*criteria)
+        .group_by(StudentCourseScore.student_id)
+    )
+    return {row.student_id: row for row in aggregates}
+
+
+def check_students_records(student_ids=None, repair=False) -> list:
+    """
+    function to verify the students records against a full recompute from their courses,
+    and optionally repair the ones that drifted.
+
+    :param student_ids: a range or a list of the Student IDs to check, all students if None
+    :param repair: write the recomputed values to the mismatched records
+    :type student_ids: range | list
+    :type repair: bool
+    :return: the mismatches, with the stored and the expected values of each field that differs
+    :rtype: list
+    """
+    criteria = [] if student_ids is None else [_in_students(StudentCourseScore.student_id, student_ids)]
+    aggregates = calc_records_aggregates(*criteria)
+    records = StudentRecord.query.order_by(StudentRecord.student_id)
+    if student_ids is not None:
+        records = records.filter(_in_students(StudentRecord.student_id, student_ids))
+
+    mismatches = []
+    for record in records:
+        aggregate = aggregates.get(record.student_id)
+        expected = {
+            "course_count": aggregate.course_count if aggregate else 0,
+            "total_credits": aggregate.total_credits if aggregate else 0,
+            "total_points": aggregate.total_points if aggregate else 0,
+        }
+        expected["gpa"] = calc_gpa(expected["total_points"], expected["total_credits"])
+        expected["honours"] = calc_honours(expected["gpa"])
+
+        fields = {
+            field: {"stored": getattr(record, field), "expected": value}
+            for field, value in expected.items()
+            if getattr(record, field) != value
+        }
+        if fields:
+            mismatches.append({"student_id": record.student_id, "fields": fields})
+            if repair:
+                for field, value in expected.items():
+                    setattr(record, field, value)
+    if repair and mismatches:
+        db.session.commit()
+    return mismatches
+
+
+def regrade_course_scores(student_ids) -> int:
+    """
+    function to grade again the graded courses of some students against the current
+    grade scale, written with one executemany UPDATE, and refresh their student course view rows.
+    Does not commit.
+
+    :param student_ids: a range or a list of Student IDs
+    :return: the number of course scores graded
+    :rtype: int
+    """
+    graded_courses = db.session.query(
+        StudentCourseScore.id, StudentCourseScore.score, StudentCourseScore.credit
+    ).filter(
+        _in_students(StudentCourseScore.student_id, student_ids),
+        StudentCourseScore.grade.is_not(None),
+    )
+    course_scores = []
+    for course_score in graded_courses:
+        grade, grade_point = get_score_grade(course_score.score)
+        course_scores.append(
+            dict(
+                id=course_score.id,
+                grade=grade,
+                grade_point=grade_point,
+                scored_point=course_score.credit * grade_point,
+            )
+        )
+    if course_scores:
+        db.session.execute(update(StudentCourseScore), course_scores)
+        refresh_student_course_view(StudentCourseScore.student_id, student_ids)
+    return len(course_scores)
+
+
+def rebuild_students_records(student_ids, regrade=False) -> int:
+    """
+    function to recompute the records of some students from their courses,
+    with one grouped aggregate and one executemany UPDATE, then commit.
+
+    :param student_ids: a range (e.g. a chunk of the rebuild) or a list of Student IDs
+    :param regrade: grade the scores again against the grade scale first
+    :type student_ids: range | list
+    :type regrade: bool
+    :return: the number of records rebuilt
+    :rtype: int
+    """
+    if regrade:
+        regrade_course_scores(student_ids)
+    records = db.session.query(StudentRecord.id, StudentRecord.student_id).filter(
+        _in_students(StudentRecord.student_id, student_ids)
+    )
+    aggregates = calc_records_aggregates(_in_students(StudentCourseScore.student_id, student_ids))
+
+    students_records = []
+    for record in records:
+        aggregate = aggregates.get(record.student_id)
+        total_credits = aggregate.total_credits if aggregate else 0
+        total_points = aggregate.total_points if aggregate else 0
+        gpa = calc_gpa(total_points, total_credits)
+        students_records.append(
+            dict(
+                id=record.id,
+                course_count=aggregate.course_count if aggregate else 0,
+                total_credits=total_credits,
+                total_points=total_points,
+                gpa=gpa,
+                honours=calc_honours(gpa),
+            )
+        )
+    if students_records:
+        db.session.execute(update(StudentRecord), students_records)
+    db.session.commit()
+    return len(students_records)
+
+
+def _in_students(column, student_ids):
+    # a range of IDs is filtered with BETWEEN, so that a large chunk is not sent as IN parameters
+    if isinstance(student_ids, range):
+        return column.between(student_ids.start, student_ids.stop - 1)
+    return column.in_(student_ids)
+
+
+def refresh_students_records(student_ids) -> None:
+    """
+    function to recompute the records of a set of students with one UPDATE ... FROM a grouped
+    aggregate of their courses, without reading anything back. Does not commit.
+
+    :param student_ids: a select of the Student IDs to refresh, e.g. all students of a department
+    """
+    totals = (
+        select(
+            StudentCourseScore.student_id,
+            func.count(StudentCourseScore.id).label("course_count"),
+            func.coalesce(func.sum(StudentCourseScore.credit), 0).label("total_credits"),
+            func.coalesce(func.sum(StudentCourseScore.scored_point), 0).label("total_points"),
+        )
+        .where(StudentCourseScore.student_id.in_(student_ids))
+        .group_by(StudentCourseScore.student_id)
+        .subquery()
+    )
+    records = StudentRecord.__table__
+    gpa = gpa_expr(totals.c.total_points, totals.c.total_credits)
+    db.session.execute(
+        update(records)
+        .where(records.c.student_id == totals.c.student_id)
+        .values(
+            course_count=totals.c.course_count,
+            total_credits=totals.c.total_credits,
+            total_points=totals.c.total_points,
+            gpa=gpa,
+            honours=honours_expr(gpa),
+        )
+    )
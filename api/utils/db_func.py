@@ -9,8 +9,14 @@ class DB_Func:
         db.session.commit()
 
     def delete_from_db(self):
+        self.invalidate_cache()
         db.session.delete(self)
         db.session.commit()
 
     def update_db(self):
+        self.invalidate_cache()
         db.session.commit()
+
+    def invalidate_cache(self) -> None:
+        """hook for models that are cached outside the session, called before they are written."""
+        pass
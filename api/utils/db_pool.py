@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long checkouts wait for a connection, how many time out,
+    and the most connections checked out at once, for the admin stats.
+
+    The wait includes opening a new connection when the pool grows; the pre-ping is not counted.
+    Counters are per process and start again when the pool is recreated (e.g. on `engine.dispose()`).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._peak_checked_out = 0
+
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        waited = perf_counter() - started
+        with self._stats_lock:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._peak_checked_out = max(self._peak_checked_out, self.checkedout())
+        return connection
+
+    def stats(self) -> dict:
+        # with an unlimited overflow (-1) there is no saturation to report
+        capacity = self.size() + self._max_overflow if self._max_overflow >= 0 else None
+        with self._stats_lock:
+            return {
+                "pool": type(self).__name__,
+                "size": self.size(),
+                "max_overflow": self._max_overflow,
+                "timeout": self._timeout,
+                "checked_out": self.checkedout(),
+                "idle": self.checkedin(),
+                "overflow": max(self.overflow(), 0),
+                "saturation": round(self.checkedout() / capacity, 4) if capacity else None,
+                "peak_checked_out": self._peak_checked_out,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "checkout_wait_avg_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "checkout_wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+def pool_stats(engines) -> dict:
+    """
+    function to get the connection pool stats of each engine, keyed "primary" or by bind key.
+    Pools that are not instrumented (e.g. the StaticPool of in-memory SQLite) only report their class.
+    """
+    stats = {}
+    for key, engine in engines.items():
+        pool = engine.pool
+        name = "primary" if key is None else key
+        stats[name] = pool.stats() if isinstance(pool, InstrumentedQueuePool) else {"pool": type(pool).__name__}
+    return stats
+
+
+def apply_sqlite_pragmas(engine, pragmas) -> None:
+    """function to run `PRAGMA name = value` for each of `pragmas` on every new connection of a SQLite engine."""
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+@contextmanager
+def without_statement_timeout(engine):
+    """
+    context manager running the statements of `engine` without the statement_timeout of its
+    connections (DB_STATEMENT_TIMEOUT), for the maintenance commands whose statements run long.
+
+    PostgreSQL only; the pooled connections are closed afterwards, as they keep the setting.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+
+    def disable_timeout(dbapi_connection, connection_record, connection_proxy):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SET statement_timeout = 0")
+        finally:
+            cursor.close()
+
+    event.listen(engine, "checkout", disable_timeout)
+    try:
+        yield
+    finally:
+        event.remove(engine, "checkout", disable_timeout)
+        engine.dispose()
@@ -0,0 +1,72 @@
+from sqlalchemy import exists, func, insert, literal, select
+from . import db
+from .calc_func import refresh_students_records
+from .view_func import refresh_student_course_view
+from ..models import Student, Course, StudentCourseScore
+
+
+def enroll_students(course_ids, registered_by, department_id=None, student_ids=None) -> dict:
+    """
+    function to register a cohort of students into the same courses in one transaction.
+
+    The registrations are created with one INSERT ... SELECT over the cohort and the courses,
+    skipping the ones that already exist, then the records of the cohort are refreshed with one
+    UPDATE from a grouped aggregate, and its student course view rows are rewritten.
+    Nothing is loaded into the session.
+
+    :param course_ids: the Course IDs to register
+    :param registered_by: username of the user enrolling the students
+    :param department_id: enroll every student of this department
+    :param student_ids: or enroll these students
+    :raises ValueError: if the cohort is not given or given both ways, or some courses or students do not exist
+    :return: the number of students in the cohort and of registrations created
+    :rtype: dict
+    """
+    if department_id is not None and student_ids:
+        raise ValueError("Provide a department_id or a list of student_ids, not both")
+    if department_id is not None:
+        in_cohort = Student.department_id == department_id
+    elif student_ids:
+        in_cohort = Student.student_id.in_(student_ids)
+    else:
+        raise ValueError("Provide a department_id or a list of student_ids")
+    if not course_ids:
+        raise ValueError("Provide a list of course_ids")
+    found = set(db.session.scalars(select(Course.id).where(Course.id.in_(course_ids))))
+    if found != set(course_ids):
+        raise ValueError(f"Courses not found: {sorted(set(course_ids) - found)}")
+    if student_ids and department_id is None:
+        found = set(db.session.scalars(select(Student.student_id).where(in_cohort)))
+        if found != set(student_ids):
+            raise ValueError(f"Students not found: {sorted(set(student_ids) - found)}")
+
+    cohort = select(Student.student_id).where(in_cohort)
+    new_registrations = select(
+        Student.student_id,
+        Student.matric_no,
+        Course.id,
+        Course.code,
+        Course.department_id,
+        Course.credit,
+        literal(registered_by),
+    ).where(
+        in_cohort,
+        Course.id.in_(course_ids),
+        ~exists().where(
+            StudentCourseScore.student_id == Student.student_id,
+            StudentCourseScore.course_id == Course.id,
+        ),
+    )
+    registered = db.session.execute(
+        insert(StudentCourseScore.__table__).from_select(
+            ["student_id", "matric_no", "course_id", "course_code", "department_id", "credit", "registered_by"],
+            new_registrations,
+        )
+    ).rowcount
+    if registered:
+        refresh_students_records(cohort)
+        refresh_student_course_view(StudentCourseScore.student_id, cohort)
+    db.session.commit()
+
+    students = db.session.scalar(select(func.count()).select_from(cohort.subquery()))
+    return {"students": students, "registered": registered}
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from flask import current_app
+
+
+class JobRunner:
+    """
+    Runs long requests, such as large grade uploads, on a thread pool after the response is sent.
+
+    Each job runs in an app context of its own, so it gets its own database session; jobs record
+    their progress in the database for the client to poll. Jobs still queued when the process
+    exits are lost and stay pending.
+    """
+
+    def __init__(self, workers=2):
+        self._lock = Lock()
+        self._executor = None
+        self.configure(workers)
+
+    def configure(self, workers) -> None:
+        """function to resize the pool, called once per app."""
+        self.shutdown(wait=False)
+        self.workers = workers
+
+    def submit(self, fn, *args):
+        app = current_app._get_current_object()
+
+        def run():
+            with app.app_context():
+                try:
+                    return fn(*args)
+                except Exception:
+                    app.logger.exception("Background job %s failed", fn.__name__)
+                    raise
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            return self._executor.submit(run)
+
+    def shutdown(self, wait=True) -> None:
+        """function to stop the pool, waiting for the running and queued jobs if `wait`."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+job_runner = JobRunner()
@@ -0,0 +1,159 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from http import HTTPStatus
+from urllib.parse import urlencode
+from flask import current_app, request
+from flask_restx import abort, reqparse
+from sqlalchemy import and_, bindparam, or_
+from . import db
+
+
+# documented query arguments of every paginated list route
+page_parser = reqparse.RequestParser()
+page_parser.add_argument("limit", type=int, location="args", help="Page size, capped by the server")
+page_parser.add_argument("cursor", type=str, location="args", help="Opaque cursor of the next page, from the previous page")
+
+
+@dataclass
+class Page:
+    """A page request: at most `limit` rows, after the row the cursor was made from."""
+
+    limit: int
+    after: list = None
+
+
+class PageRows(list):
+    """The rows of a page, with the cursor of the next page (None on the last page)."""
+
+    next_cursor = None
+
+
+def get_page() -> Page:
+    """function to read the page arguments of the request, aborting with 400 if they are invalid."""
+    args = page_parser.parse_args()
+    max_limit = current_app.config["PAGINATION_MAX_LIMIT"]
+    limit = args["limit"] or current_app.config["PAGINATION_DEFAULT_LIMIT"]
+    if limit < 1:
+        abort(HTTPStatus.BAD_REQUEST, message="limit must be a positive integer")
+    after = decode_cursor(args["cursor"]) if args["cursor"] else None
+    return Page(limit=min(limit, max_limit), after=after)
+
+
+def encode_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        values = None
+    if not isinstance(values, list):
+        abort(HTTPStatus.BAD_REQUEST, message="Invalid cursor")
+    return values
+
+
+def paginate(query, keys, page=None):
+    """
+    function to run a list query one page at a time, with keyset (seek) pagination.
+
+    The rows are sorted by `keys`, which must identify a row uniquely, and a page starts right
+    after the key values of the last row of the previous page, so a page costs the same at any
+    depth and stays stable while rows are added.
+
+    :param query: the list query, without its order_by
+    :param keys: (column, descending) pairs of the sort; the rows must have attributes named
+        like the columns
+    :param page: the page requested, from get_page; without a page all the rows are returned
+    :return: the rows, and the cursor of the next page
+    :rtype: PageRows
+    """
+    order_by = [column.desc() if descending else column.asc() for column, descending in keys]
+    query = query.order_by(None).order_by(*order_by)
+    if page is None:
+        return query.all()
+
+    if page.after is not None:
+        if len(page.after) != len(keys):
+            abort(HTTPStatus.BAD_REQUEST, message="Invalid cursor")
+        query = query.filter(_after_keys(keys, page.after))
+    return _page_rows(query.limit(page.limit + 1).all(), keys, page.limit)
+
+
+class KeysetStatements:
+    """
+    A list statement with its sort and its page filters built once, taking the page limit and
+    the cursor values as bound parameters, so that SQLAlchemy finds it in its compiled cache
+    without rebuilding it or computing its cache key again on every call.
+    Rows are paged the same way as by `paginate`.
+    """
+
+    def __init__(self, statement, keys):
+        order_by = [column.desc() if descending else column.asc() for column, descending in keys]
+        self.keys = keys
+        self.all_rows = statement.order_by(None).order_by(*order_by)
+        self.first_page = self.all_rows.limit(bindparam("page_limit"))
+        self.next_page = self.all_rows.where(
+            _after_keys(keys, [bindparam(f"after_{index}") for index in range(len(keys))])
+        ).limit(bindparam("page_limit"))
+
+    def execute(self, params, page=None):
+        """
+        function to run the statement with `params`, one page at a time if `page` is given.
+
+        :return: the rows, and the cursor of the next page
+        :rtype: PageRows
+        """
+        if page is None:
+            return db.session.execute(self.all_rows, params).all()
+
+        params = dict(params, page_limit=page.limit + 1)
+        statement = self.first_page
+        if page.after is not None:
+            if len(page.after) != len(self.keys):
+                abort(HTTPStatus.BAD_REQUEST, message="Invalid cursor")
+            params.update((f"after_{index}", value) for index, value in enumerate(page.after))
+            statement = self.next_page
+        return _page_rows(db.session.execute(statement, params).all(), self.keys, page.limit)
+
+
+def page_headers(rows) -> dict:
+    """function to build the Link and X-Next-Cursor headers of a page of rows."""
+    if getattr(rows, "next_cursor", None) is None:
+        return {}
+    args = request.args.to_dict()
+    args["cursor"] = rows.next_cursor
+    return {
+        "Link": f'<{request.base_url}?{urlencode(args)}>; rel="next"',
+        "X-Next-Cursor": rows.next_cursor,
+    }
+
+
+def _page_rows(rows, keys, limit) -> PageRows:
+    # one row more than the limit is fetched to know if there is a next page
+    rows = PageRows(rows)
+    if len(rows) > limit:
+        del rows[limit:]
+        rows.next_cursor = encode_cursor([getattr(rows[-1], column.key) for column, _ in keys])
+    return rows
+
+
+def _after_keys(keys, values):
+    # (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ..., with < for the descending keys
+    clauses = []
+    for index, (column, descending) in enumerate(keys):
+        seek = column < values[index] if descending else column > values[index]
+        equal = [keys[previous][0] == values[previous] for previous in range(index)]
+        clauses.append(and_(*equal, seek))
+    return or_(*clauses)
+
+
+def stream_rows(query, keys, yield_per):
+    """
+    function to iterate over all the rows of a list query in the page order, fetched `yield_per`
+    rows at a time (with a server-side cursor where the database supports it), for exports.
+    """
+    order_by = [column.desc() if descending else column.asc() for column, descending in keys]
+    return iter(query.order_by(None).order_by(*order_by).yield_per(yield_per))
@@ -0,0 +1,107 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from threading import BoundedSemaphore, Lock
+from flask import current_app
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class HashingPoolSaturated(ServiceUnavailable):
+    description = "Too many password operations in progress, please retry shortly."
+
+
+class HashingPool:
+    """
+    Runs password hashing in a process pool, so that the hashing does not hold the GIL of the
+    web process. The request thread still waits for the result, for up to `timeout` seconds.
+
+    At most `queue_size` operations can be running or waiting at once; beyond that `submit`
+    refuses with a 503 and a Retry-After header instead of queueing, so a login storm cannot
+    take every worker thread. A request that stops waiting after `timeout` also gets the 503,
+    and its slot is only freed once the hash has finished in the pool.
+    With `workers` set to 0 the hashing runs inline, still bounded.
+    """
+
+    def __init__(self, workers=0, queue_size=16, timeout=30, retry_after=1):
+        self._lock = Lock()
+        self._executor = None
+        self._executor_pid = None
+        self.configure(workers, queue_size, timeout, retry_after)
+
+    def configure(self, workers, queue_size, timeout, retry_after) -> None:
+        """function to resize the pool, called once per app."""
+        self.shutdown()
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = BoundedSemaphore(queue_size)
+
+    def _get_executor(self):
+        # the pool is created lazily in each (forked) worker process
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def submit(self, fn, *args):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise HashingPoolSaturated(retry_after=self.retry_after)
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                slots.release()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            raise HashingPoolSaturated(retry_after=self.retry_after)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool()
+
+
+def _normalize_method(method) -> str:
+    """function to spell out the iterations werkzeug leaves implicit, e.g. 'pbkdf2:sha256'."""
+    if method.startswith("pbkdf2:") and method.count(":") == 1:
+        return f"{method}:{DEFAULT_PBKDF2_ITERATIONS}"
+    return method
+
+
+def hash_password(password) -> str:
+    """function to hash a password with the configured PASSWORD_HASH_METHOD, on the hashing pool."""
+    return hashing_pool.submit(
+        generate_password_hash, password, current_app.config["PASSWORD_HASH_METHOD"]
+    )
+
+
+def verify_password(password_hash, password) -> bool:
+    """function to check a password against its hash, on the hashing pool."""
+    return hashing_pool.submit(check_password_hash, password_hash, password)
+
+
+def password_needs_rehash(password_hash) -> bool:
+    """
+    function to check if a stored hash was made with other parameters than the configured ones.
+
+    :param password_hash: the stored password hash, e.g. 'pbkdf2:sha256:260000$salt$hash'
+    :type password_hash: str
+    :return: True if the password should be hashed again
+    :rtype: bool
+    """
+    method = password_hash.split("$", 1)[0]
+    return _normalize_method(method) != _normalize_method(current_app.config["PASSWORD_HASH_METHOD"])
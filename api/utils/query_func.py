@@ -1,6 +1,8 @@
-from sqlalchemy import and_, asc, desc, func
-from sqlalchemy.orm import defer
+from sqlalchemy import asc, bindparam, desc, func, select
+from sqlalchemy.orm import aliased
 from . import db
+from .pagination import KeysetStatements, paginate, stream_rows
+from .request_loader import get_loader
 from ..models import (
     User,
     Student,
@@ -8,32 +10,131 @@ from ..models import (
     Department,
     Course,
     StudentCourseScore,
+    StudentCourseView,
     StudentRecord,
 )
 
 
+# a course's teacher is left joined as its teachers row then its users row: left joining the Teacher
+# entity nests (users JOIN teachers), which SQLite materializes by scanning every teacher
+teachers = Teacher.__table__
+teacher_user = aliased(User, name="teacher_user")
+
+
+# the columns serialized by student_model and teacher_model, read from the users and students
+# (or teachers) tables without loading the entities and their password hashes
+student_columns = (
+    Student.student_id,
+    Student.user_id,
+    Student.title,
+    Student.first_name,
+    Student.last_name,
+    Student.gender,
+    Student.username,
+    Student.email,
+    Student.type,
+    Student.matric_no,
+    Student.is_active,
+    Student.department_id,
+    Student.created_on,
+    Student.created_by,
+    Student.modified_on,
+    Student.modified_by,
+)
+teacher_columns = (
+    Teacher.teacher_id,
+    Teacher.user_id,
+    Teacher.title,
+    Teacher.first_name,
+    Teacher.last_name,
+    Teacher.gender,
+    Teacher.username,
+    Teacher.email,
+    Teacher.staff_code,
+    Teacher.is_staff,
+    Teacher.type,
+    Teacher.department_id,
+    Teacher.created_on,
+    Teacher.created_by,
+    Teacher.modified_on,
+    Teacher.modified_by,
+)
+
+
+"""STUDENT COURSE DETAILS STATEMENTS"""
+
+def _student_course_details_select(*criteria):
+    """
+    function to build the SELECT of the details of student courses (student, course, department,
+    score and teacher) shared by the student course details functions, filtered by `criteria`.
+    They are read from the student course view, already joined.
+    """
+    return select(
+        StudentCourseView.student_id,
+        StudentCourseView.matric_no,
+        StudentCourseView.student_name,
+        StudentCourseView.gender,
+        StudentCourseView.course_id,
+        StudentCourseView.course_code,
+        StudentCourseView.course_name,
+        StudentCourseView.course_credit,
+        StudentCourseView.department_name,
+        StudentCourseView.registered_on,
+        StudentCourseView.registered_by,
+        StudentCourseView.score,
+        StudentCourseView.grade,
+        StudentCourseView.grade_point,
+        StudentCourseView.scored_point,
+        StudentCourseView.teacher,
+    ).where(*criteria)
+
+
+# built once at import, found in the compiled cache on every call; the values are bound at execution
+student_courses_details = KeysetStatements(
+    _student_course_details_select(StudentCourseView.student_id == bindparam("student_id")),
+    [(StudentCourseView.course_id, False)],
+)
+student_course_detail_by_id = _student_course_details_select(
+    StudentCourseView.student_id == bindparam("student_id"),
+    StudentCourseView.course_id == bindparam("course_id"),
+)
+student_courses_by_id_list = _student_course_details_select(
+    StudentCourseView.student_id == bindparam("student_id"),
+    StudentCourseView.course_id.in_(bindparam("course_ids", expanding=True)),
+).order_by(asc(StudentCourseView.course_name))
+courses_students_by_id_list = _student_course_details_select(
+    StudentCourseView.course_id == bindparam("course_id"),
+    StudentCourseView.student_id.in_(bindparam("student_ids", expanding=True)),
+).order_by(desc(func.coalesce(StudentCourseView.score, -1)))
+
+# the score to sort a course's students by: ungraded students (NULL) last on every database,
+# and a seek value they match too, where `score < :v` is never true for NULL
+course_student_score = func.coalesce(StudentCourseView.score, -1).label("sort_score")
+
+
 """USER FUNCTIONS"""
 
 def check_email_exist(email):
-    email_exist = User.query.filter_by(email=email).first()
+    email_exist = get_loader().get(User.email, email)
     return True if email_exist else False
 
 
 """DEPARTMENT FUNCTIONS"""
 
-def get_all_departments():
-    return Department.query.all()
+def get_all_departments(page=None):
+    return paginate(Department.query, [(Department.id, False)], page)
 
 
 def check_department_exist(code) -> bool:
-    course_exist = Department.query.filter_by(code=code).first()
+    course_exist = get_loader().get(Department.code, code)
     return True if course_exist else False
 
 
 """TEACHER FUNCTIONS"""
 
-def get_all_teachers():
-    return Teacher.query.all()
+def get_all_teachers(page=None):
+    """function to get the details of all teachers, a page at a time if `page` is given."""
+    return paginate(db.session.query(*teacher_columns), [(Teacher.teacher_id, False)], page)
 
 
 """COURSES FUNCTION"""
@@ -42,15 +143,27 @@ def get_all_courses():
     return Course.query.all()
 
 def check_course_code_exist(code) -> bool:
-    code_exist = Course.query.filter_by(code=code).first()
+    code_exist = get_loader().get(Course.code, code)
     return True if code_exist else False
 
+def get_course(course_id):
+    """function to get a course by ID, fetched at most once per request."""
+    return get_loader().get(Course.id, course_id)
+
 def check_course_exist(course_id) -> bool:
-    course_exist = Course.query.filter_by(id=course_id).first()
+    course_exist = get_course(course_id)
     return True if course_exist else False
 
-def get_all_courses():
-    """function to get all courses from the database."""
+def get_courses_by_id_list(course_ids:list):
+    """function to get the courses found for a list of course IDs, the ones not fetched yet in the request in one query."""
+    courses = get_loader().get_many(Course.id, course_ids)
+    return [course for course in courses.values() if course is not None]
+
+def get_all_courses(page=None, yield_per=None):
+    """
+    function to get all courses from the database, a page at a time if `page` is given,
+    or as an iterator fetching `yield_per` rows at a time if it is given.
+    """
     courses = (
         db.session.query(
             Course.id,
@@ -59,19 +172,21 @@ def get_all_courses():
             Course.credit.label("course_credit"),
             Department.name.label("department_name"),
             Course.teacher_id,
-            (Teacher.title + " " + Teacher.first_name + " " + Teacher.last_name).label(
+            (teacher_user.title + " " + teacher_user.first_name + " " + teacher_user.last_name).label(
                 "teacher"
             ),
-            (Teacher.gender + "").label("gender"),
+            (teacher_user.gender + "").label("gender"),
             Course.created_by,
             Course.created_on,
         )
-        .outerjoin(Teacher, Teacher.teacher_id == Course.teacher_id)
+        .outerjoin(teachers, teachers.c.teacher_id == Course.teacher_id)
+        .outerjoin(teacher_user, teacher_user.id == teachers.c.user_id)
         .outerjoin(Department, Department.id == Course.department_id)
-        .order_by(Course.id)
-        .all()
     )
-    return courses
+    keys = [(Course.id, False)]
+    if yield_per:
+        return stream_rows(courses, keys, yield_per)
+    return paginate(courses, keys, page)
 
 
 def get_course_details_by_id(course_id):
@@ -91,14 +206,15 @@ def get_course_details_by_id(course_id):
             Course.credit.label("course_credit"),
             Department.name.label("department_name"),
             Course.teacher_id,
-            (Teacher.title + " " + Teacher.first_name + " " + Teacher.last_name).label(
+            (teacher_user.title + " " + teacher_user.first_name + " " + teacher_user.last_name).label(
                 "teacher"
             ),
-            (Teacher.gender + "").label("gender"),
+            (teacher_user.gender + "").label("gender"),
             Course.created_by,
             Course.created_on,
         )
-        .outerjoin(Teacher, Teacher.teacher_id == Course.teacher_id)
+        .outerjoin(teachers, teachers.c.teacher_id == Course.teacher_id)
+        .outerjoin(teacher_user, teacher_user.id == teachers.c.user_id)
         .outerjoin(Department, Department.id == Course.department_id)
         .filter(Course.id == course_id)
         .first()
@@ -107,98 +223,76 @@ def get_course_details_by_id(course_id):
 
 
 # Get Students Registered for a Course
-def get_course_students(course_id):
+def get_course_students(course_id, page=None):
     """
     function to get all students that regostered for a certain course by passing the course id as an argument.
 
     :param course_id: Course ID
+    :param page: the page to get, all students if None
     :type course_id: int
+    :type page: Page
     :return: the result of the query
     :rtype: object
     """
     course_students = (
         db.session.query(
-            StudentCourseScore.student_id,
-            StudentCourseScore.matric_no,
-            (Student.first_name + " " + Student.last_name).label("student_name"),
-            (Student.gender + "").label("gender"),
-            StudentCourseScore.course_id,
-            StudentCourseScore.course_code,
-            Course.name.label("course_name"),
-            StudentCourseScore.registered_on,
-            StudentCourseScore.registered_by,
-            StudentCourseScore.score,
-            StudentCourseScore.grade,
-            StudentCourseScore.grade_point,
-            StudentCourseScore.scored_point,
+            StudentCourseView.student_id,
+            StudentCourseView.matric_no,
+            StudentCourseView.student_name,
+            (StudentCourseView.gender + "").label("gender"),
+            StudentCourseView.course_id,
+            StudentCourseView.course_code,
+            StudentCourseView.course_name,
+            StudentCourseView.registered_on,
+            StudentCourseView.registered_by,
+            StudentCourseView.score,
+            StudentCourseView.grade,
+            StudentCourseView.grade_point,
+            StudentCourseView.scored_point,
+            course_student_score,
         )
-        .outerjoin(Student, Student.student_id == StudentCourseScore.student_id)
-        .outerjoin(Course, Course.id == StudentCourseScore.course_id)
-        .filter(StudentCourseScore.course_id == course_id)
-        .order_by(desc(StudentCourseScore.score))
-        .all()
+        .filter(StudentCourseView.course_id == course_id)
     )
-    return course_students
+    # best scores first, ties in Student ID order
+    keys = [(course_student_score, True), (StudentCourseView.student_id, False)]
+    return paginate(course_students, keys, page)
 
 
 # GET SPECIFIC COURSE OFFERED BY A STUDENT
 def get_courses_students_by_id_list(student_ids:list, course_id):
     """
-    This function returns a list of course just enrolled by a specific student by passing the student ID and the course IDs as a list.
+    This function returns the course details of a list of students registered for a course, best scores first, by passing the Student IDs as a list and the course ID.
 
-    :param student_id: the Student ID
-    :param course_ids: the Course IDs to be enrolled
-    :type student_id: int
-    :type course_ids: list
+    :param student_ids: the Student IDs
+    :param course_id: the Course ID
+    :type student_ids: list
+    :type course_id: int
     :return: the query result
     :rtype: object
     """
-    course_students = (
-        db.session.query(
-            Student.student_id,
-            Student.matric_no,
-            (Student.first_name + " " + Student.last_name).label("student_name"),
-            Student.gender,
-            StudentCourseScore.course_id,
-            Course.code.label("course_code"),
-            Course.name.label("course_name"),
-            Course.credit.label("course_credit"),
-            Department.name.label("department_name"),
-            StudentCourseScore.registered_on,
-            StudentCourseScore.registered_by,
-            StudentCourseScore.score.label("score"),
-            StudentCourseScore.grade.label("grade"),
-            StudentCourseScore.grade_point.label("grade_point"),
-            StudentCourseScore.scored_point.label("scored_point"),
-            (Teacher.title + " " + Teacher.first_name + " " + Teacher.last_name).label(
-                "teacher"
-            ),
-        )
-        .outerjoin(Course, Course.id == StudentCourseScore.course_id)
-        .outerjoin(Student, Student.student_id == StudentCourseScore.student_id)
-        .outerjoin(Department, Department.id == StudentCourseScore.department_id)
-        .outerjoin(Teacher, Teacher.teacher_id == Course.teacher_id)
-        .filter(
-            StudentCourseScore.course_id == course_id,
-            StudentCourseScore.student_id.in_(student_ids),
-        )
-        .order_by(desc(StudentCourseScore.score))
-        .all()
-    )
+    course_students = db.session.execute(
+        courses_students_by_id_list, {"course_id": course_id, "student_ids": list(student_ids)}
+    ).all()
     return course_students
 
 
+"""STUDENT FUNCTIONS"""
 
+def get_all_students(page=None):
+    """function to get the details of all students from the databasae, a page at a time if `page` is given."""
+    return paginate(db.session.query(*student_columns), [(Student.student_id, False)], page)
 
-"""STUDENT FUNCTIONS"""
+def get_student_details(student_id):
+    """function to get the details of a student, without loading the entity, by passing 'student_id' as an argument"""
+    return db.session.query(*student_columns).filter(Student.student_id == student_id).first()
 
-def get_all_students():
-    """function to get all students from the databasae"""
-    return Student.query.all()
+def get_student(student_id):
+    """function to get a student by Student ID, fetched at most once per request."""
+    return get_loader().get(Student.student_id, student_id)
 
 def check_student_exist(student_id) -> bool:
     """function to check if student exist, by passing 'student_id' as an argument"""
-    student_exist = Student.query.filter_by(student_id=student_id).first()
+    student_exist = get_student(student_id)
     return True if student_exist else False
 
 # GET A STUDENT RECORDS
@@ -224,7 +318,7 @@ def get_student_records(student_id):
             ((StudentRecord.gpa) / 100).label("GPA"),
             StudentRecord.honours,
         )
-        .outerjoin(Student, Student.student_id == StudentRecord.student_id)
+        .join(Student, Student.student_id == StudentRecord.student_id)
         .outerjoin(Department, Department.id == Student.student_id)
         .filter(StudentRecord.student_id == student_id)
         .first()
@@ -232,9 +326,10 @@ def get_student_records(student_id):
     return student_records
 
 # GET ALL STUDENTS RECORDS
-def get_all_students_records():
+def get_all_students_records(page=None, yield_per=None):
     """
-    function to get all records (course count, total credits, total points, GPA and honours) for all students.
+    function to get all records (course count, total credits, total points, GPA and honours) for all students,
+    a page at a time if `page` is given, or as an iterator fetching `yield_per` rows at a time if it is given.
     """
     students_records = (
         db.session.query(
@@ -249,54 +344,28 @@ def get_all_students_records():
             ((StudentRecord.gpa) / 100).label("GPA"),
             StudentRecord.honours,
         )
-        .outerjoin(Student, Student.student_id == StudentRecord.student_id)
+        .join(Student, Student.student_id == StudentRecord.student_id)
         .outerjoin(Department, Department.id == Student.student_id)
-        .all()
     )
-    return students_records
+    keys = [(StudentRecord.student_id, False)]
+    if yield_per:
+        return stream_rows(students_records, keys, yield_per)
+    return paginate(students_records, keys, page)
 
 
 # GET ALL COURSES OFFERED BY A STUDENT
-def get_student_courses_details(student_id):
+def get_student_courses_details(student_id, page=None):
     """
     function to get all courses details registered by specific student by passing student id as an argument.
 
     :param student_id: Student ID
-    :param course_id: Course ID
+    :param page: the page to get, all courses if None
     :type student_id: int
-    :type course_id: int
+    :type page: Page
     :return: the result of the query
     :rtype: object
     """
-    student_courses = (
-        db.session.query(
-            Student.student_id,
-            Student.matric_no,
-            (Student.first_name + " " + Student.last_name).label("student_name"),
-            Student.gender,
-            StudentCourseScore.course_id,
-            Course.code.label("course_code"),
-            Course.name.label("course_name"),
-            Course.credit.label("course_credit"),
-            Department.name.label("department_name"),
-            StudentCourseScore.registered_on,
-            StudentCourseScore.registered_by,
-            StudentCourseScore.score.label("score"),
-            StudentCourseScore.grade.label("grade"),
-            StudentCourseScore.grade_point.label("grade_point"),
-            StudentCourseScore.scored_point.label("scored_point"),
-            (Teacher.title + " " + Teacher.first_name + " " + Teacher.last_name).label(
-                "teacher"
-            ),
-        )
-        .outerjoin(Course, Course.id == StudentCourseScore.course_id)
-        .outerjoin(Student, Student.student_id == StudentCourseScore.student_id)
-        .outerjoin(Department, Department.id == StudentCourseScore.department_id)
-        .outerjoin(Teacher, Teacher.teacher_id == Course.teacher_id)
-        .filter(StudentCourseScore.student_id == student_id)
-        .all()
-    )
-    return student_courses
+    return student_courses_details.execute({"student_id": student_id}, page)
 
 
 # GET SPECIFIC COURSE OFFERED BY A STUDENT
@@ -311,37 +380,9 @@ def get_student_course_detail_by_id(student_id, course_id):
     :return: the result of the query
     :rtype: object
     """
-    student_course = (
-        db.session.query(
-            Student.student_id,
-            Student.matric_no,
-            (Student.first_name + " " + Student.last_name).label("student_name"),
-            Student.gender,
-            StudentCourseScore.course_id,
-            Course.code.label("course_code"),
-            Course.name.label("course_name"),
-            Course.credit.label("course_credit"),
-            Department.name.label("department_name"),
-            StudentCourseScore.registered_on,
-            StudentCourseScore.registered_by,
-            StudentCourseScore.score.label("score"),
-            StudentCourseScore.grade.label("grade"),
-            StudentCourseScore.grade_point.label("grade_point"),
-            StudentCourseScore.scored_point.label("scored_point"),
-            (Teacher.title + " " + Teacher.first_name + " " + Teacher.last_name).label(
-                "teacher"
-            ),
-        )
-        .outerjoin(Course, Course.id == StudentCourseScore.course_id)
-        .outerjoin(Student, Student.student_id == StudentCourseScore.student_id)
-        .outerjoin(Department, Department.id == StudentCourseScore.department_id)
-        .outerjoin(Teacher, Teacher.teacher_id == Course.teacher_id)
-        .filter(
-            StudentCourseScore.student_id == student_id,
-            StudentCourseScore.course_id == course_id,
-        )
-        .all()
-    )
+    student_course = db.session.execute(
+        student_course_detail_by_id, {"student_id": student_id, "course_id": course_id}
+    ).all()
     return student_course
 
 
@@ -357,42 +398,12 @@ def get_student_courses_by_id_list(student_id, course_ids:list):
     :return: the query result
     :rtype: object
     """
-    student_courses = (
-        db.session.query(
-            Student.student_id,
-            Student.matric_no,
-            (Student.first_name + " " + Student.last_name).label("student_name"),
-            Student.gender,
-            StudentCourseScore.course_id,
-            Course.code.label("course_code"),
-            Course.name.label("course_name"),
-            Course.credit.label("course_credit"),
-            Department.name.label("department_name"),
-            StudentCourseScore.registered_on,
-            StudentCourseScore.registered_by,
-            StudentCourseScore.score.label("score"),
-            StudentCourseScore.grade.label("grade"),
-            StudentCourseScore.grade_point.label("grade_point"),
-            StudentCourseScore.scored_point.label("scored_point"),
-            (Teacher.title + " " + Teacher.first_name + " " + Teacher.last_name).label(
-                "teacher"
-            ),
-        )
-        .outerjoin(Course, Course.id == StudentCourseScore.course_id)
-        .outerjoin(Student, Student.student_id == StudentCourseScore.student_id)
-        .outerjoin(Department, Department.id == StudentCourseScore.department_id)
-        .outerjoin(Teacher, Teacher.teacher_id == Course.teacher_id)
-        .filter(
-            StudentCourseScore.student_id == student_id,
-            StudentCourseScore.course_id.in_(course_ids),
-        )
-        .order_by(asc(Course.name))
-        .all()
-    )
+    student_courses = db.session.execute(
+        student_courses_by_id_list, {"student_id": student_id, "course_ids": list(course_ids)}
+    ).all()
     return student_courses
 
 
-
 """CHECK FUNCTIONS"""
 
 # Check if Student Registered for a Course
@@ -411,3 +422,40 @@ def get_student_registered_course_by_id(student_id, course_id) -> None:
         StudentCourseScore.course_id == course_id,
     ).first()
     return student_enrollled_course
+
+
+# Get the Registrations of a Course for a List of Students
+def get_course_registrations(course_id, student_ids:list):
+    registrations = (
+        db.session.query(
+            StudentCourseScore.id,
+            StudentCourseScore.student_id,
+            StudentCourseScore.course_id,
+            StudentCourseScore.credit,
+        )
+        .filter(
+            StudentCourseScore.course_id == course_id,
+            StudentCourseScore.student_id.in_(student_ids),
+        )
+        .all()
+    )
+    return registrations
+
+
+# Get the Registrations of a Student for a List of Courses
+def get_student_registrations(student_id, course_ids:list):
+    registrations = (
+        db.session.query(
+            StudentCourseScore.id,
+            StudentCourseScore.student_id,
+            StudentCourseScore.course_id,
+            StudentCourseScore.credit,
+            StudentCourseScore.scored_point,
+        )
+        .filter(
+            StudentCourseScore.student_id == student_id,
+            StudentCourseScore.course_id.in_(course_ids),
+        )
+        .all()
+    )
+    return registrations
@@ -0,0 +1,200 @@
+import csv
+import io
+from itertools import islice
+from decouple import config
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .password_func import hash_password
+from .sequence_func import code_allocator
+from ..models import Department, User, Student, Teacher, StudentRecord
+from ..models.users import Gender, Title
+
+
+REQUIRED_FIELDS = ("user_type", "first_name", "last_name", "gender", "email", "department_id")
+
+USER_TYPES = {
+    "STUDENT": (Student, "DEFAULT_STUDENT_PASSWORD"),
+    "TEACHER": (Teacher, "DEFAULT_TEACHER_PASSWORD"),
+}
+
+
+def read_bulk_rows(request):
+    """
+    function to read the users to register from the request body,
+    either a JSON array or a CSV stream with a header row of the register fields.
+
+    :return: an iterable of dicts, or None if the body is neither
+    """
+    if request.mimetype == "text/csv":
+        return csv.DictReader(io.TextIOWrapper(request.stream, encoding="utf-8-sig"))
+    data = request.get_json(silent=True)
+    return data if isinstance(data, list) else None
+
+
+def clean_register_row(row) -> dict:
+    """
+    function to validate and normalize one user to register.
+
+    :raises ValueError: with the reason the row cannot be registered
+    """
+    if not isinstance(row, dict):
+        raise ValueError("Expected an object of user fields")
+    missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+    user_type = str(row["user_type"]).strip().upper()
+    if user_type not in USER_TYPES:
+        raise ValueError("Select User Type: TEACHER or STUDENT")
+    gender = str(row["gender"]).strip().upper()
+    if gender not in Gender.__members__:
+        raise ValueError("Gender must be MALE or FEMALE")
+    title = str(row.get("title") or "").strip().upper() or None
+    if title and title not in Title.__members__:
+        raise ValueError(f"Title must be one of {', '.join(Title.__members__)}")
+    try:
+        department_id = int(row["department_id"])
+    except (TypeError, ValueError):
+        raise ValueError("Department ID must be an integer")
+
+    return {
+        "user_type": user_type,
+        "title": title,
+        "first_name": str(row["first_name"]).strip(),
+        "last_name": str(row["last_name"]).strip(),
+        "gender": gender,
+        "email": str(row["email"]).strip(),
+        "department_id": department_id,
+    }
+
+
+def register_users(rows, created_by, chunk_size=500) -> dict:
+    """
+    function to register many students and teachers at once.
+
+    The default password of each user type is hashed once for the whole batch. Each chunk of
+    users gets its usernames and matric numbers/staff codes from the code allocator, is inserted
+    with one flush followed by one insert of the student records, and is committed on its own.
+    Rows with an email already taken or an unknown department are reported as failed before
+    the insert; a chunk that still fails (e.g. an email registered concurrently) is rolled back
+    and its rows are reported as failed.
+
+    :param rows: an iterable of dicts with the register fields
+    :param created_by: username of the admin registering the users
+    :param chunk_size: number of users committed per transaction
+    :return: the created and failed counts and a result per row, in input order
+    :rtype: dict
+    """
+    results = []
+    seen_emails = set()
+    password_hashes = {}
+    rows = enumerate(rows, start=1)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        valid_rows = []
+        for index, row in chunk:
+            try:
+                valid_rows.append((index, clean_register_row(row)))
+            except ValueError as error:
+                email = row.get("email") if isinstance(row, dict) else None
+                results.append(_failed_row(index, email, str(error)))
+
+        emails = [row["email"] for _, row in valid_rows]
+        existing_emails = {
+            email for (email,) in db.session.query(User.email).filter(User.email.in_(emails))
+        }
+        # a row with an unknown department would fail the foreign key of the whole chunk
+        department_ids = {row["department_id"] for _, row in valid_rows}
+        existing_departments = {
+            department_id for (department_id,) in db.session.query(Department.id).filter(Department.id.in_(department_ids))
+        }
+        new_users = []
+        for index, row in valid_rows:
+            if row["email"] in existing_emails or row["email"] in seen_emails:
+                results.append(_failed_row(index, row["email"], "Email already exist"))
+                continue
+            if row["department_id"] not in existing_departments:
+                results.append(_failed_row(index, row["email"], "Department does not exist"))
+                continue
+            seen_emails.add(row["email"])
+
+            user_type = row.pop("user_type")
+            model, password_key = USER_TYPES[user_type]
+            if user_type not in password_hashes:
+                password_hashes[user_type] = hash_password(config(password_key))
+            new_user = model(
+                **row,
+                password_hash=password_hashes[user_type],
+                must_change_password=True,
+                created_by=created_by,
+                is_staff=model is Teacher,
+            )
+            new_users.append((index, new_user))
+
+        if new_users:
+            results.extend(_save_new_users(new_users, created_by))
+
+    results.sort(key=lambda result: result["row"])
+    created = sum(1 for result in results if result["status"] == "created")
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+def _save_new_users(new_users, created_by) -> list:
+    # final usernames and codes are allocated up front, so each user is inserted once
+    usernames = iter(code_allocator.take("username", len(new_users)))
+    students = [new_user for _, new_user in new_users if isinstance(new_user, Student)]
+    teachers = [new_user for _, new_user in new_users if isinstance(new_user, Teacher)]
+    for _, new_user in new_users:
+        new_user.username = User.make_username(next(usernames), new_user.first_name, new_user.last_name)
+    for new_user, number in zip(students, code_allocator.take("matric_no", len(students))):
+        new_user.matric_no = Student.make_matric_no(number)
+    for new_user, number in zip(teachers, code_allocator.take("staff_code", len(teachers))):
+        new_user.staff_code = Teacher.make_staff_code(number)
+
+    db.session.add_all(new_user for _, new_user in new_users)
+    try:
+        # one flush allocates the user, student and teacher IDs of the whole chunk
+        db.session.flush()
+        results = []
+        student_records = []
+        for index, new_user in new_users:
+            result = _created_row(index, new_user)
+            if isinstance(new_user, Student):
+                result.update(student_id=new_user.student_id, matric_no=new_user.matric_no)
+                student_records.append(
+                    dict(
+                        student_id=new_user.student_id,
+                        matric_no=new_user.matric_no,
+                        department_id=new_user.department_id,
+                        created_by=created_by,
+                    )
+                )
+            else:
+                result.update(teacher_id=new_user.teacher_id, staff_code=new_user.staff_code)
+            results.append(result)
+        if student_records:
+            db.session.execute(insert(StudentRecord), student_records)
+        db.session.commit()
+    except IntegrityError as error:
+        db.session.rollback()
+        message = f"Not registered, the chunk was rolled back: {error.orig}"
+        return [_failed_row(index, new_user.email, message) for index, new_user in new_users]
+    return results
+
+
+def _created_row(index, new_user) -> dict:
+    return {
+        "row": index,
+        "email": new_user.email,
+        "status": "created",
+        "user_id": new_user.id,
+        "username": new_user.username,
+    }
+
+
+def _failed_row(index, email, message) -> dict:
+    return {"row": index, "email": email, "status": "failed", "message": message}
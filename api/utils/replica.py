@@ -0,0 +1,161 @@
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic, time
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+
+READ_METHODS = ("GET", "HEAD")
+# requests carrying this cookie read from the primary until the UNIX time it holds
+PRIMARY_COOKIE = "read_primary_until"
+
+# seconds the standby is behind, 0 when it has replayed all it received (or is not a standby)
+_POSTGRESQL_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaRouter:
+    """
+    Sends the SELECTs of GET and HEAD requests to the "replica" bind, when SQLALCHEMY_BINDS has one.
+
+    Everything else reads and writes on the primary: other methods, flushes, locking reads,
+    work outside requests (CLI commands, background jobs), reads wrapped in `read_from_primary`,
+    and users that wrote in the last `read_your_writes` seconds. Those are known by their JWT
+    identity in the process that served the write, and by a cookie, for clients that keep it,
+    in the other processes.
+    The replica lag is measured at most every `lag_check_interval` seconds; while it is above
+    `max_lag` seconds, or the replica cannot be reached, reads go to the primary.
+    """
+
+    def __init__(self, max_lag=5.0, lag_check_interval=1.0, read_your_writes=5):
+        self._lock = Lock()
+        self.configure(max_lag, lag_check_interval, read_your_writes)
+
+    def configure(self, max_lag, lag_check_interval, read_your_writes) -> None:
+        """function to set the routing limits and forget the measured lag, called once per app."""
+        with self._lock:
+            self.max_lag = max_lag
+            self.lag_check_interval = lag_check_interval
+            self.read_your_writes = read_your_writes
+            self._lag = None
+            self._checked_at = None
+            self._measuring = False
+            # the time until which each identity that wrote reads from the primary
+            self._writers = {}
+
+    def use_replica(self, session, clause) -> bool:
+        """function to tell whether a statement about to run on `session` may read from the replica."""
+        if not isinstance(clause, Select) or clause._for_update_arg is not None or session._flushing:
+            return False
+        if not has_request_context() or request.method not in READ_METHODS or g.get("read_primary"):
+            return False
+        engine = session._db.engines.get("replica")
+        if engine is None or self._primary_until() > time() or self._wrote_recently(_identity()):
+            return False
+        return self.replica_lag(engine) <= self.max_lag
+
+    def replica_lag(self, engine) -> float:
+        """
+        function to get the replica lag in seconds, measured again when the last measure is too old.
+
+        One thread measures at a time, without holding the lock; the others use the last measure,
+        or count the replica as stale until the first measure is done.
+        """
+        with self._lock:
+            now = monotonic()
+            due = self._checked_at is None or now - self._checked_at >= self.lag_check_interval
+            if not due or self._measuring:
+                return float("inf") if self._lag is None else self._lag
+            self._measuring = True
+        lag = float("inf")
+        try:
+            lag = self.measure_lag(engine)
+        except SQLAlchemyError:
+            current_app.logger.warning("Replica unreachable, reading from the primary", exc_info=True)
+        finally:
+            with self._lock:
+                self._lag, self._checked_at, self._measuring = lag, now, False
+        return lag
+
+    @staticmethod
+    def measure_lag(engine) -> float:
+        """
+        function to query how far the replica is behind the primary, in seconds.
+
+        Only PostgreSQL standbys report a lag; other databases (e.g. a copied SQLite file) count as up to date.
+        """
+        if engine.dialect.name != "postgresql":
+            return 0.0
+        with engine.connect() as connection:
+            return float(connection.scalar(_POSTGRESQL_LAG))
+
+    def mark_writer(self, response):
+        """function to send a client that wrote to the primary for a while, registered with `after_request`."""
+        if (
+            request.method not in READ_METHODS
+            and request.method != "OPTIONS"
+            and response.status_code < 400
+            and self.read_your_writes > 0
+            and "replica" in current_app.config["SQLALCHEMY_BINDS"]
+        ):
+            identity = _identity()
+            if identity is not None:
+                now = time()
+                with self._lock:
+                    if len(self._writers) >= 1024:
+                        self._writers = {key: until for key, until in self._writers.items() if until > now}
+                    self._writers[identity] = now + self.read_your_writes
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                str(int(time()) + self.read_your_writes),
+                max_age=self.read_your_writes,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def _wrote_recently(self, identity) -> bool:
+        return identity is not None and self._writers.get(identity, 0) > time()
+
+    @staticmethod
+    def _primary_until() -> float:
+        try:
+            return float(request.cookies.get(PRIMARY_COOKIE, 0))
+        except ValueError:
+            return 0.0
+
+
+def _identity():
+    # the identity of the token verified in this request, None before verification or without a token
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+replica_router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """The Flask-SQLAlchemy session, with the reads of GET requests sent to the replica by `replica_router`."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and replica_router.use_replica(self, clause):
+            return self._db.engines["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_from_primary():
+    """context manager sending the reads of the current request to the primary, for reads that must not be stale."""
+    previous = g.get("read_primary", False)
+    g.read_primary = True
+    try:
+        yield
+    finally:
+        g.read_primary = previous
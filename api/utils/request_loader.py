@@ -0,0 +1,50 @@
+from flask import g
+
+
+class RequestLoader:
+    """
+    Memo of the entities looked up during one request, keyed by the column they were
+    looked up by and its value, so that a row checked for existence and then used is
+    fetched once. Lookups that found nothing are remembered as None.
+
+    Kept on `flask.g` by `get_loader` and dropped at the end of each request.
+    """
+
+    def __init__(self):
+        self._entities = {}
+
+    def get(self, column, value):
+        """function to get the entity whose `column` equals `value`, or None, querying it on first use."""
+        key = (column.class_, column.key, value)
+        if key not in self._entities:
+            self._entities[key] = column.class_.query.filter(column == value).first()
+        return self._entities[key]
+
+    def get_many(self, column, values) -> dict:
+        """
+        function to get the entities whose `column` is in `values`, loading the ones
+        not looked up yet in this request with one query.
+
+        :return: the entity, or None if not found, of each value
+        :rtype: dict
+        """
+        model = column.class_
+        missing = [value for value in dict.fromkeys(values) if (model, column.key, value) not in self._entities]
+        if missing:
+            for value in missing:
+                self._entities[(model, column.key, value)] = None
+            for entity in model.query.filter(column.in_(missing)):
+                self._entities[(model, column.key, getattr(entity, column.key))] = entity
+        return {value: self._entities[(model, column.key, value)] for value in values}
+
+
+def get_loader() -> RequestLoader:
+    """function to get the loader of the current request, created on first use."""
+    if "loader" not in g:
+        g.loader = RequestLoader()
+    return g.loader
+
+
+def drop_loader(exception=None) -> None:
+    """function to drop the loader at the end of a request, registered with `teardown_request`."""
+    g.pop("loader", None)
@@ -0,0 +1,85 @@
+from threading import Lock
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from . import db
+from ..models import User, Student, Teacher, CodeSequence
+
+
+# a sequence created on first use starts after the highest ID its codes used to be derived from
+SEQUENCE_SEEDS = {
+    "username": User.id,
+    "matric_no": Student.student_id,
+    "staff_code": Teacher.teacher_id,
+}
+
+
+class CodeAllocator:
+    """
+    Hands out numbers for usernames, matric numbers and staff codes from the code_sequences table.
+
+    Each process reserves numbers in blocks of `block_size` with one short transaction of its own,
+    then serves them from memory, so a new user can be inserted with its final codes. Numbers
+    reserved by a process that exits are skipped, codes are unique but not gapless.
+    """
+
+    def __init__(self, block_size=20):
+        self._lock = Lock()
+        self.configure(block_size)
+
+    def configure(self, block_size) -> None:
+        """function to drop the reserved blocks, called once per app."""
+        with self._lock:
+            self.block_size = block_size
+            self._blocks = {}
+
+    def next(self, name) -> int:
+        return self.take(name, 1)[0]
+
+    def take(self, name, count) -> list:
+        """
+        function to allocate `count` numbers from a sequence.
+
+        :param name: the sequence name, one of SEQUENCE_SEEDS
+        :param count: how many numbers to allocate
+        :return: the allocated numbers, in increasing order
+        :rtype: list
+        """
+        with self._lock:
+            numbers = []
+            block = self._blocks.get(name, range(0))
+            while len(numbers) < count:
+                if not block:
+                    block = self._reserve(name, max(self.block_size, count - len(numbers)))
+                taken = block[: count - len(numbers)]
+                numbers.extend(taken)
+                block = block[len(taken):]
+            self._blocks[name] = block
+            return numbers
+
+    def _reserve(self, name, size) -> range:
+        # a transaction of its own, committed at once: allocate before the session writes,
+        # since on SQLite the reservation needs the database write lock.
+        sequences = CodeSequence.__table__
+        try:
+            with db.engine.begin() as connection:
+                reserved = connection.execute(
+                    update(sequences)
+                    .where(sequences.c.name == name)
+                    .values(next_value=sequences.c.next_value + size)
+                )
+                if reserved.rowcount == 0:
+                    start = connection.execute(
+                        select(func.coalesce(func.max(SEQUENCE_SEEDS[name]), 0) + 1)
+                    ).scalar()
+                    connection.execute(insert(sequences).values(name=name, next_value=start + size))
+                    return range(start, start + size)
+                end = connection.execute(
+                    select(sequences.c.next_value).where(sequences.c.name == name)
+                ).scalar()
+                return range(end - size, end)
+        except IntegrityError:
+            # another process created the sequence first
+            return self._reserve(name, size)
+
+
+code_allocator = CodeAllocator()
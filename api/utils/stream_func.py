@@ -0,0 +1,27 @@
+from flask import Response, stream_with_context
+from .serializer import compile_model, dumps
+
+
+def stream_json_list(rows, model) -> Response:
+    """
+    function to send a JSON array of rows marshalled with a restx model, one row at a time.
+
+    The array is written as the rows are read, so a full export is never held in memory,
+    neither as rows nor as the response body.
+
+    :param rows: an iterator of rows, e.g. from pagination.stream_rows
+    :param model: the restx model (or fields dict) the route would marshal with,
+        compiled by the serializer
+    """
+    serialize = compile_model(model).serialize
+
+    def generate():
+        yield b"["
+        for index, row in enumerate(rows):
+            if index:
+                yield b","
+            yield dumps(serialize(row))
+        yield b"]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
@@ -0,0 +1,116 @@
+import csv
+import io
+from datetime import datetime
+from . import db
+from .calc_func import get_score_grade, write_course_scores
+from ..models import StudentCourseScore, GradeUploadJob
+
+
+def read_score_rows(stream) -> list:
+    """
+    function to read the scores of a CSV upload, with a header row of
+    `matric_no` or `student_id`, and `score`.
+
+    The whole body is read into memory before grading, as a background job grades it after
+    the response; the routes cap its size with MAX_CONTENT_LENGTH.
+
+    :param stream: the binary request stream
+    :return: the rows as dicts
+    :rtype: list
+    """
+    return list(csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig")))
+
+
+def grade_course_scores(course_id, rows, modified_by) -> dict:
+    """
+    function to grade the scores of many students for a course.
+
+    The registrations of the course are loaded with one query and the rows are graded in memory
+    against the compiled grade scale, then written with one executemany UPDATE. The records of
+    the students graded are recomputed with one grouped aggregate and committed together with the
+    scores. Rows that cannot be graded are skipped and reported.
+
+    :param course_id: Course ID
+    :param rows: dicts with `matric_no` or `student_id`, and `score`
+    :param modified_by: username of the user uploading the scores
+    :return: the graded and failed counts, and the reason of each failed row
+    :rtype: dict
+    """
+    registrations = db.session.query(
+        StudentCourseScore.id,
+        StudentCourseScore.student_id,
+        StudentCourseScore.matric_no,
+        StudentCourseScore.credit,
+    ).filter(StudentCourseScore.course_id == course_id)
+    by_student_id, by_matric_no = {}, {}
+    for registration in registrations:
+        by_student_id[registration.student_id] = registration
+        by_matric_no[registration.matric_no] = registration
+
+    course_scores = {}
+    errors = []
+    for index, row in enumerate(rows, start=1):
+        try:
+            registration = _find_registration(row, by_student_id, by_matric_no)
+            score = _clean_score(row.get("score"))
+        except ValueError as error:
+            errors.append({"row": index, "message": str(error)})
+            continue
+        if get_score_grade(score)[0] is None:
+            errors.append({"row": index, "message": f"No grade covers the score {score}"})
+            continue
+        if registration.id in course_scores:
+            errors.append({"row": index, "message": f"Student {registration.student_id} already graded in this file"})
+            continue
+        course_scores[registration.id] = (registration, score)
+
+    write_course_scores(course_scores.values(), modified_by)
+    return {"graded": len(course_scores), "failed": len(errors), "errors": errors}
+
+
+def run_grade_upload_job(job_id, rows) -> None:
+    """function to grade an upload and record the outcome on its job."""
+    job = db.session.get(GradeUploadJob, job_id)
+    job.status = GradeUploadJob.RUNNING
+    db.session.commit()
+    try:
+        result = grade_course_scores(job.course_id, rows, job.created_by)
+    except Exception as error:
+        db.session.rollback()
+        job.status = GradeUploadJob.FAILED
+        job.errors = [{"row": None, "message": str(error)}]
+        job.finished_on = datetime.utcnow()
+        db.session.commit()
+        raise
+    job.status = GradeUploadJob.COMPLETED
+    job.graded_rows = result["graded"]
+    job.failed_rows = result["failed"]
+    job.errors = result["errors"]
+    job.finished_on = datetime.utcnow()
+    db.session.commit()
+
+
+def _find_registration(row, by_student_id, by_matric_no):
+    if row.get("student_id"):
+        try:
+            student_id = int(row["student_id"])
+        except ValueError:
+            raise ValueError("Student ID must be an integer")
+        registration = by_student_id.get(student_id)
+    elif row.get("matric_no"):
+        registration = by_matric_no.get(row["matric_no"].strip())
+    else:
+        raise ValueError("Missing student_id or matric_no")
+    if registration is None:
+        raise ValueError("Student not registered for the course")
+    return registration
+
+
+def _clean_score(score) -> int:
+    try:
+        score = int(str(score).strip())
+    except ValueError:
+        raise ValueError("Score must be an integer")
+    if score < 0:
+        raise ValueError("Score cannot be negative")
+    return score
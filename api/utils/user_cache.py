@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from sqlalchemy import inspect
+from . import db
+
+
+class UserCache:
+    """
+    Bounded LRU cache of resolved users keyed by username, with a time-to-live per entry.
+
+    Entries are dropped when they expire, when the cache is full (least recently used first),
+    or when the cached instance has been expired by a commit since it was loaded.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def configure(self, maxsize, ttl) -> None:
+        """function to resize the cache and drop all entries, called once per app."""
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self.hits = 0
+            self.misses = 0
+            self._entries.clear()
+
+    def get(self, username):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None:
+                expires_at, user_id, user = entry
+                state = inspect(user)
+                if expires_at > monotonic() and not state.expired_attributes and not state.modified:
+                    self._entries.move_to_end(username)
+                    self.hits += 1
+                    return user
+                del self._entries[username]
+            self.misses += 1
+            return None
+
+    def set(self, username, user) -> None:
+        if self.maxsize <= 0 or username is None:
+            return
+        with self._lock:
+            self._entries[username] = (monotonic() + self.ttl, user.id, user)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user) -> None:
+        """function to drop every entry held for a user, by username or by user id."""
+        # read the instance state directly so that invalidating never triggers a load
+        state = inspect(user)
+        username = state.dict.get("username")
+        user_id = state.identity[0] if state.identity else None
+        with self._lock:
+            for key, (_, cached_id, _) in list(self._entries.items()):
+                if key == username or (user_id is not None and cached_id == user_id):
+                    del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+user_cache = UserCache()
+
+
+def lookup_user(username):
+    """
+    function to resolve a user by username, going through the per-process user cache.
+
+    :param username: the username stored as the JWT identity
+    :type username: str
+    :return: the user (Student, Teacher or User) attached to the current session, or None
+    :rtype: object
+    """
+    from ..models import User
+
+    user = user_cache.get(username)
+    if user is not None:
+        # attach a copy to the current session without hitting the database
+        return db.session.merge(user, load=False)
+
+    user = User.query.filter_by(username=username).one_or_none()
+    if user is not None:
+        user_cache.set(username, user)
+    return user
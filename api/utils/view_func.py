@@ -0,0 +1,91 @@
+from sqlalchemy import delete, func, insert, select
+from . import db
+from .query_func import teacher_user, teachers
+from ..models import Student, Course, Department, StudentCourseScore, StudentCourseView
+
+
+def student_course_view_source(*criteria):
+    """
+    function to build the SELECT of the student course view rows from the source tables,
+    (student_courses_scores joined to students, courses, departments and teachers), filtered by `criteria`.
+    """
+    return (
+        select(
+            StudentCourseScore.id,
+            StudentCourseScore.student_id,
+            Student.matric_no,
+            (Student.first_name + " " + Student.last_name).label("student_name"),
+            Student.gender,
+            StudentCourseScore.department_id,
+            StudentCourseScore.course_id,
+            Course.code.label("course_code"),
+            Course.name.label("course_name"),
+            Course.credit.label("course_credit"),
+            Department.name.label("department_name"),
+            (teacher_user.title + " " + teacher_user.first_name + " " + teacher_user.last_name).label(
+                "teacher"
+            ),
+            StudentCourseScore.registered_on,
+            StudentCourseScore.registered_by,
+            StudentCourseScore.score,
+            StudentCourseScore.grade,
+            StudentCourseScore.grade_point,
+            StudentCourseScore.scored_point,
+        )
+        .select_from(StudentCourseScore)
+        .join(Student, Student.student_id == StudentCourseScore.student_id)
+        .outerjoin(Course, Course.id == StudentCourseScore.course_id)
+        .outerjoin(Department, Department.id == StudentCourseScore.department_id)
+        .outerjoin(teachers, teachers.c.teacher_id == Course.teacher_id)
+        .outerjoin(teacher_user, teacher_user.id == teachers.c.user_id)
+        .where(*criteria)
+    )
+
+
+def refresh_student_course_view(column, values) -> None:
+    """
+    function to rewrite the student course view rows of some registrations from the source tables,
+    with one DELETE and one INSERT ... SELECT. Pending changes are flushed first. Does not commit.
+
+    :param column: the StudentCourseScore column selecting the registrations: id, student_id,
+        course_id or department_id
+    :param values: a list, a range or a select of the values of the column
+    """
+    db.session.flush()
+    view = StudentCourseView.__table__
+    source = student_course_view_source(_in_values(column, values))
+    db.session.execute(delete(view).where(_in_values(view.c[column.key], values)))
+    db.session.execute(insert(view).from_select([selected.name for selected in source.selected_columns], source))
+
+
+def rebuild_student_course_view(chunk_size=5000) -> int:
+    """
+    function to rebuild the whole student course view from the source tables,
+    one chunk of Student IDs at a time, each chunk committed on its own.
+
+    :return: the number of view rows written
+    :rtype: int
+    """
+    view = StudentCourseView.__table__
+    first_id, last_id = db.session.query(
+        func.min(StudentCourseScore.student_id), func.max(StudentCourseScore.student_id)
+    ).one()
+    if first_id is None:
+        db.session.execute(delete(view))
+    else:
+        # rows of students left without registrations, the chunks rewrite all the others
+        db.session.execute(delete(view).where(~view.c.student_id.between(first_id, last_id)))
+        for start in range(first_id, last_id + 1, chunk_size):
+            refresh_student_course_view(
+                StudentCourseScore.student_id, range(start, min(start + chunk_size, last_id + 1))
+            )
+            db.session.commit()
+    db.session.commit()
+    return db.session.query(func.count(StudentCourseView.id)).scalar()
+
+
+def _in_values(column, values):
+    # a range of IDs is filtered with BETWEEN, so that a large chunk is not sent as IN parameters
+    if isinstance(values, range):
+        return column.between(values.start, values.stop - 1)
+    return column.in_(values)
@@ -0,0 +1,48 @@
+"""
+Compare restx `marshal` with the compiled serializer of `api.utils.serializer`
+on synthetic rows of the list response models.
+
+    JWT_SECRET_KEY=x DATABASE_URL=sqlite:// python -m benchmarks.bench_serializer --rows 10000
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+from flask_restx import marshal
+from api.course.schemas import course_model
+from api.student.schemas import student_course_model, student_model, student_records_model
+from api.utils.serializer import compile_model, dumps
+
+
+def make_rows(model, count):
+    now = datetime.utcnow()
+    values = {"String": "STU/023/0001", "Integer": 42, "Float": 3.5, "DateTime": now, "Boolean": True}
+    rows = []
+    for index in range(count):
+        row = {key: values.get(type(field).__name__) for key, field in model.items()}
+        row["id"] = index
+        rows.append(SimpleNamespace(**row))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    models = [student_model, student_records_model, student_course_model, course_model]
+    print(f"{'model':<32} {'marshal+json':>14} {'compiled+dumps':>16} {'speedup':>8}")
+    for model in models:
+        rows = make_rows(model, args.rows)
+        compiled = compile_model(model)
+        assert compiled(rows) == marshal(rows, model)
+
+        restx_time = min(timeit.repeat(lambda: json.dumps(marshal(rows, model)), number=1, repeat=args.repeat))
+        compiled_time = min(timeit.repeat(lambda: dumps(compiled(rows)), number=1, repeat=args.repeat))
+        print(f"{model.name:<32} {restx_time * 1000:>12.1f}ms {compiled_time * 1000:>14.1f}ms {restx_time / compiled_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Compare the per-call cost of the student course details queries joined from the source tables
+or built on every call with the statements of `api.utils.query_func` built once on the student
+course view, on an in-memory SQLite database.
+
+    JWT_SECRET_KEY=x DATABASE_URL=sqlite:// python -m benchmarks.bench_statements --calls 2000
+"""
+import argparse
+import timeit
+from sqlalchemy import insert
+from api import create_app
+from api.config.config import config_dict
+from api.models import Course, Student, StudentCourseScore, StudentCourseView
+from api.utils import db
+from api.utils import query_func
+from api.utils.query_func import _student_course_details_select
+from api.utils.view_func import rebuild_student_course_view, student_course_view_source
+
+
+def seed(students=20, courses=10):
+    for number in range(1, students + 1):
+        db.session.add(Student(
+            first_name="Student", last_name=f"Test{number}", gender="MALE", type="student",
+            email=f"student{number}@test.com", username=f"student.test{number}",
+            matric_no=f"STU/023/{number:04d}", password_hash="x",
+        ))
+    for number in range(1, courses + 1):
+        db.session.add(Course(name=f"Course {number}", code=f"C{number:03d}", credit=3))
+    db.session.commit()
+    db.session.execute(insert(StudentCourseScore), [
+        dict(student_id=student_id, matric_no=f"STU/023/{student_id:04d}", course_id=course_id,
+             course_code=f"C{course_id:03d}", credit=3, score=50 + course_id)
+        for student_id in range(1, students + 1) for course_id in range(1, courses + 1)
+    ])
+    db.session.commit()
+    rebuild_student_course_view()
+
+
+def joined(student_id, course_ids):
+    # the details joined from the source tables on every call, as before the student course view
+    return db.session.execute(student_course_view_source(
+        StudentCourseScore.student_id == student_id,
+        StudentCourseScore.course_id.in_(course_ids),
+    ).order_by(Course.name)).all()
+
+
+def rebuilt(student_id, course_ids):
+    # the query as it was written before: constructed, and its cache key computed, on every call
+    return db.session.execute(_student_course_details_select(
+        StudentCourseView.student_id == student_id,
+        StudentCourseView.course_id.in_(course_ids),
+    ).order_by(StudentCourseView.course_name)).all()
+
+
+def uncached(student_id, course_ids):
+    # the same, compiled again on every call as without SQLAlchemy's compiled cache
+    return db.session.execute(_student_course_details_select(
+        StudentCourseView.student_id == student_id,
+        StudentCourseView.course_id.in_(course_ids),
+    ).order_by(StudentCourseView.course_name), execution_options={"compiled_cache": None}).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app(config=config_dict["test"])
+    with app.app_context():
+        db.create_all()
+        seed()
+        course_ids = [1, 3, 5]
+        assert rebuilt(7, course_ids) == query_func.get_student_courses_by_id_list(7, course_ids)
+
+        print(f"{'get_student_courses_by_id_list':<34} {'per call':>10}")
+        for label, call in [
+            ("joined on every call", lambda: joined(7, course_ids)),
+            ("compiled on every call", lambda: uncached(7, course_ids)),
+            ("built on every call", lambda: rebuilt(7, course_ids)),
+            ("built once", lambda: query_func.get_student_courses_by_id_list(7, course_ids)),
+        ]:
+            seconds = min(timeit.repeat(call, number=args.calls, repeat=3)) / args.calls
+            print(f"{label:<34} {seconds * 1e6:>8.0f}us")
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
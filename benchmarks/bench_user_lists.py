@@ -0,0 +1,88 @@
+"""
+Compare loading a page of students as Student entities with the column-projected loader of
+`api.utils.query_func`, on an in-memory SQLite database: statements, rows, time and memory.
+
+    JWT_SECRET_KEY=x DATABASE_URL=sqlite:// python -m benchmarks.bench_user_lists --students 5000 --limit 500
+"""
+import argparse
+import time
+import tracemalloc
+from sqlalchemy import event, insert
+from api import create_app
+from api.config.config import config_dict
+from api.models import Student, User
+from api.student.schemas import student_model
+from api.utils import db
+from api.utils.pagination import Page, paginate
+from api.utils.query_func import get_all_students
+from api.utils.serializer import compile_model
+
+
+def seed(count):
+    db.session.execute(insert(User), [
+        dict(id=number, type="student", first_name="Student", last_name=f"Test{number}", gender="MALE",
+             email=f"student{number}@test.com", username=f"student.test{number}", password_hash="x" * 102)
+        for number in range(1, count + 1)
+    ])
+    db.session.execute(Student.__table__.insert(), [
+        dict(student_id=number, user_id=number, matric_no=f"STU/023/{number:04d}") for number in range(1, count + 1)
+    ])
+    db.session.commit()
+
+
+def load_entities(page):
+    # the loader as it was: full Student entities, password hashes included
+    return paginate(Student.query, [(Student.student_id, False)], page)
+
+
+def measure(load, page, repeat=5):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    serialize = compile_model(student_model)
+    event.listen(db.engine, "before_cursor_execute", count)
+    body = serialize(load(page))
+    event.remove(db.engine, "before_cursor_execute", count)
+
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        rows = load(page)
+        serialize(rows)
+        timings.append(time.perf_counter() - started)
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    rows = load(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(statements), len(rows), min(timings), peak, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app(config=config_dict["test"])
+    with app.app_context():
+        db.create_all()
+        seed(args.students)
+        page = Page(limit=args.limit)
+
+        print(f"{'loader':<22} {'statements':>10} {'rows':>6} {'time':>9} {'peak memory':>12}")
+        bodies = []
+        for label, load in [("Student entities", load_entities), ("projected columns", get_all_students)]:
+            statements, rows, elapsed, peak, body = measure(load, page)
+            bodies.append(body)
+            print(f"{label:<22} {statements:>10} {rows:>6} {elapsed * 1000:>7.1f}ms {peak / 1024:>10.0f}KB")
+        assert bodies[0] == bodies[1]
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from logging.config import fileConfig
 from flask import current_app
 
 from alembic import context
+from sqlalchemy.sql.functions import FunctionElement
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -45,6 +46,15 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # SQLite does not reflect the indexes on expressions, e.g. COALESCE(score, -1), so autogenerate
+    # would add them again on every run; they are written by hand in their migrations
+    if type_ == "index" and not reflected:
+        expressions = (getattr(expression, "element", expression) for expression in object.expressions)
+        return not any(isinstance(expression, FunctionElement) for expression in expressions)
+    return True
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -93,10 +103,21 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == "sqlite":
+            # batch migrations copy and drop tables, and the seed rows are written before the rows they reference,
+            # so the foreign_keys pragma of the app connections is turned off while migrating
+            connection.exec_driver_sql("PRAGMA foreign_keys = OFF")
+            connection.commit()
+        elif connection.dialect.name == "postgresql":
+            # index builds and backfills run longer than the statement_timeout of the app connections
+            connection.exec_driver_sql("SET statement_timeout = 0")
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
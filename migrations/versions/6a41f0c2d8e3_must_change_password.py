@@ -0,0 +1,54 @@
+"""must change password flag
+
+Revision ID: 6a41f0c2d8e3
+Revises: 3c9d1e7a5b20
+Create Date: 2026-10-18 10:03:17.552901
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a41f0c2d8e3'
+down_revision = '3c9d1e7a5b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from decouple import config
+    from werkzeug.security import check_password_hash
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('must_change_password', sa.Boolean(), nullable=True))
+
+    # flag the users still on one of the default passwords, once, instead of on every login
+    default_passwords = [
+        password
+        for password in (
+            config("DEFAULT_STUDENT_PASSWORD", None),
+            config("DEFAULT_TEACHER_PASSWORD", None),
+            config("DEFAULT_ADMIN_PASSWORD", None),
+        )
+        if password
+    ]
+
+    users = sa.table(
+        'users',
+        sa.column('id', sa.Integer),
+        sa.column('password_hash', sa.String),
+        sa.column('must_change_password', sa.Boolean),
+    )
+    connection = op.get_bind()
+    connection.execute(users.update().values(must_change_password=False))
+    for user in connection.execute(sa.select(users.c.id, users.c.password_hash)):
+        if any(check_password_hash(user.password_hash, password) for password in default_passwords):
+            connection.execute(
+                users.update().where(users.c.id == user.id).values(must_change_password=True)
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('must_change_password')
@@ -0,0 +1,27 @@
+"""course view score nulls last
+
+Revision ID: a2c7e4f19d38
+Revises: 17d0e2d51bd4
+Create Date: 2026-10-18 21:12:40.518207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2c7e4f19d38'
+down_revision = '17d0e2d51bd4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the course students are sorted on COALESCE(score, -1), so the ungraded students are paged too
+    op.drop_index('ix_student_course_view_course_id_score', table_name='student_course_view')
+    op.create_index('ix_student_course_view_course_id_score', 'student_course_view', ['course_id', sa.text('coalesce(score, -1) DESC'), 'student_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_student_course_view_course_id_score', table_name='student_course_view')
+    op.create_index('ix_student_course_view_course_id_score', 'student_course_view', ['course_id', sa.text('score DESC'), 'student_id'], unique=False)